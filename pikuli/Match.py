@@ -6,7 +6,7 @@
 '''
 
 import traceback
-from . import FailExit
+from . import FailExit, Settings
 from . import Region
 
 
@@ -14,22 +14,34 @@ class Match(Region):
     '''
         Как потомок Region, класс Match сможет хранить в себе картинку в формате numpy.array; сравнивать
         сохраненную картинку с тем, что сейчас в области (x, y, w, h) отображается на экране. Будем по
-        умолчанию в конструкторе Match'а сохранять то, что есть на экране.
+        умолчанию в конструкторе Match'а сохранять то, что есть на экране. Если Match построен по скриншоту,
+        в котором искали шаблон, то сохраняется копия среза этого скриншота -- новый скриншот не делается.
     '''
 
-    def __init__(self, x, y, w, h, pattern, score):
+    def __init__(self, x, y, w, h, pattern, score, frame=None, store_image=None, frame_source=None):
         '''
-            x, y, w, h  --  области экрана ПК, которая содержит в себе искомый шаблон pattern
-            pattern     --  искомый шаблон в формате pikuli.Pattern
-            score       --  число, показывающее достоверность совпадения шаблона с изображение на экране
+            x, y, w, h   --  области экрана ПК, которая содержит в себе искомый шаблон pattern
+            pattern      --  искомый шаблон в формате pikuli.Pattern
+            score        --  число, показывающее достоверность совпадения шаблона с изображение на экране
+            frame        --  картинка области (x, y, w, h) в момент нахождения шаблона (обычно -- срез скриншота,
+                             в котором искали). None -- сделать скриншот области.
+            store_image  --  сохранять ли картинку для is_image_changed(). None -- берется Settings.StoreMatchImage.
+            frame_source --  источник кадров (см. Region), обычно -- тот же, что и у области, где искали.
         '''
         try:
-            super(Match, self).__init__(x, y, w, h)
+            super(Match, self).__init__(x, y, w, h, frame_source=frame_source)
             if not( score is None  or  (isinstance(score, float) and score > 0.0 and score <= 1.0) ):
                 raise FailExit('not( score is None  or  (isinstance(score, float) and score > 0.0 and score <= 1.0) ):')
             self._score   = score
             self._pattern = pattern
-            self.store_current_image()
+
+            if store_image is None:
+                store_image = Settings.StoreMatchImage
+            if store_image:
+                if frame is not None:
+                    self._store_image(frame)
+                else:
+                    self.store_current_image()
 
         except FailExit:
             raise FailExit('\nNew stage of %s\n[error] Incorect \'Match\' constructor call:\n\tx = %s\n\ty = %s\n\tw = %s\n\th = %s\n\tscore = %s\n\t' % (traceback.format_exc(), str(w), str(y), str(w), str(h), str(score)))
@@ -6,28 +6,65 @@ import cv2
 
 import pikuli
 from .File import File
+from .pattern_cache import pattern_image_cache
+from .pattern_profile import load_profile
 from ._exceptions import FailExit
 from pikuli import logger
 
 
 class Pattern(File):
-    """ Represents images being searched for on display. """
-    def __init__(self, img_pattern, similarity=None):
+    """
+    Represents images being searched for on display. Search parameters not given to the constructor
+    are taken from the sidecar profile `<image>.json`, if any (see :mod:`pikuli.pattern_profile`).
+    """
+    def __init__(self, img_pattern, similarity=None, search_mode=None, pyramid_depth=None, scales=None):
         """
         :param img_pattern: Имя файла, объект Pattern или Region.
         :param str similarity: Принимает float значение от 0.0 до 1.0.
+        :param str search_mode: Режим поиска (см. `pikuli.matching.SEARCH_MODES`). `None` -- берется
+                                из `Settings.SearchMode` в момент поиска.
+        :param int pyramid_depth: Ограничение сверху на глубину пирамиды для режима 'pyramid'.
+        :param scales: Масштабы, в которых ищется шаблон (см. `pikuli.matching.multiscale`). Пустой --
+                       только исходный размер; `None` -- из профиля или только исходный размер.
+
+        Параметры, равные `None`, берутся из профиля шаблона (файл `<картинка>.json`), а если их нет и там,
+        то из `Settings`.
         """
         self.__similarity = None
-
-        if isinstance(img_pattern, pikuli.Region):
+        self._profile = None
+        self._search_mode = search_mode
+        self._pyramid_depth = pyramid_depth
+        self._pyramid_levels = {}
+        self._exact_hash = None
+        self._spectra = None  # (transform size, spectra), see pikuli.matching.fft
+        self._prefilter_stats = None
+        self._gray = None
+        self._scales = None if scales is None else tuple(scales)
+        self._scaled_copies = {}
+
+        if isinstance(img_pattern, Pattern):
+            if similarity is None:
+                similarity = img_pattern.getSimilarity()
+            if search_mode is None:
+                self._search_mode = img_pattern.get_search_mode()
+            if pyramid_depth is None:
+                self._pyramid_depth = img_pattern.get_pyramid_depth()
+            if scales is None:
+                self._scales = img_pattern.get_scales()
+            # Тот же файл -- тот же профиль; незачем читать его заново:
+            self._profile = img_pattern._profile
+
+        if isinstance(img_pattern, pikuli.Region) or (isinstance(img_pattern, Pattern) and img_pattern._path is None):
             super(Pattern, self).__init__(None)
-            self._cv2_pattern = img_pattern.get_raw_screenshot()
+            if isinstance(img_pattern, Pattern):
+                self._cv2_pattern = img_pattern.get_image()
+            else:
+                self._cv2_pattern = img_pattern.get_raw_screenshot()
+            self.__similarity = similarity
 
         else:
             if isinstance(img_pattern, Pattern):
-                if similarity is None:
-                    similarity = img_pattern.getSimilarity()
-                img_path = str(img_pattern.getFilename(full_path=False))
+                img_path = str(img_pattern.getFilename(full_path=True))
             else:
                 img_path = str(img_pattern)
 
@@ -38,6 +75,7 @@ class Pattern(File):
                 if os.path.exists(path) and os.path.isfile(path):
                     self._path = path
                 else:
+                    self._path = None
                     for path in pikuli.Settings.listImagePath():
                         path = os.path.join(path, img_path)
                         if os.path.exists(path) and os.path.isfile(path):
@@ -48,35 +86,113 @@ class Pattern(File):
 
 
                 if similarity is None:
-                    self.__similarity = pikuli.Settings.MinSimilarity
+                    self.__similarity = None  # Из профиля или Settings.MinSimilarity, см. getSimilarity().
                 elif isinstance(similarity, float) and similarity > 0.0 and similarity <= 1.0:
                     self.__similarity = similarity
                 else:
                     raise FailExit('error around \'similarity\' parameter : %s' % str(similarity))
 
+                # Декодированные картинки общие для всех Pattern одного файла (см. pikuli.pattern_cache):
+                self._cv2_pattern = pattern_image_cache.get(self._path)
+                if self._cv2_pattern is None:
+                    raise FailExit('image file can not be decoded')
+
             except FailExit as e:
                 raise FailExit('[error] Incorect \'Pattern\' class constructor call:\n\timg_path = %s\n\tabspath(img_path) = %s\n\tsimilarity = %s\n\tadditional comment: -{ %s }-\n\tlistImagePath(): %s' % (str(img_path), str(self._path), str(similarity), str(e), str(list(pikuli.Settings.listImagePath()))))
 
-            self._cv2_pattern = cv2.imread(self._path)
-
-
         self.w = self._w = int(self._cv2_pattern.shape[1])
         self.h = self._h = int(self._cv2_pattern.shape[0])
 
     def __str__(self):
-        return '<Pattern of \'%s\' with similarity = %.3f>' % (self._path, self.__similarity)
+        return '<Pattern of \'%s\' with similarity = %.3f>' % (self._path, self.getSimilarity())
 
     def __repr__(self):
         return '<pikuli.Pattern.Pattern of {}>'.format(self._path and os.path.basename(self._path))
 
     def similar(self, similarity):
-        return Pattern(self._path, similarity)
+        return Pattern(self, similarity)
 
     def exact(self):
-        return Pattern(self._path, 1.0)
+        return Pattern(self, 1.0)
+
+    def pyramid(self, max_depth=None):
+        """ Returns the same pattern to be searched in the coarse-to-fine 'pyramid' mode. """
+        return Pattern(self, search_mode='pyramid', pyramid_depth=max_depth)
+
+    def gray(self):
+        """ Returns the same pattern to be searched in the grayscale-first 'gray' mode. """
+        return Pattern(self, search_mode='gray')
+
+    def multiscale(self, scales=None):
+        """
+        Returns the same pattern to be searched at several display scalings. `scales` -- factors of
+        the pattern size; `None` -- `Settings.MultiScaleFactors`.
+        """
+        return Pattern(self, scales=tuple(pikuli.Settings.MultiScaleFactors if scales is None else scales))
+
+    def scaled(self, scale):
+        """
+        Copy of the pattern resized by `scale` (cached). The similarity of the copy is lowered by
+        `Settings.MultiScaleSimilaritySlack`, as resizing spoils pixels a bit. Unless the search mode
+        is set explicitly, copies are searched in the 'pyramid' mode: most of them are not on the
+        screen, and the coarse pass rejects them cheaply.
+        """
+        if scale == 1.0:
+            return self
+        if scale not in self._scaled_copies:
+            similarity = max(0.01, self.getSimilarity() - pikuli.Settings.MultiScaleSimilaritySlack)
+            copy = Pattern(self, similarity=similarity, search_mode=self.get_search_mode() or 'pyramid', scales=())
+            size = (max(1, int(round(self._w * scale))), max(1, int(round(self._h * scale))))
+            copy._cv2_pattern = cv2.resize(self._cv2_pattern, size,
+                                           interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR)
+            copy.w = copy._w = size[0]
+            copy.h = copy._h = size[1]
+            self._scaled_copies[scale] = copy
+        return self._scaled_copies[scale]
+
+    def get_profile(self):
+        """ Sidecar profile of the pattern image (read once, on the first call); `{}` if there is none. """
+        if self._profile is None:
+            self._profile = load_profile(self._path) if self._path is not None else {}
+        return self._profile
 
     def getSimilarity(self):
-        return self.__similarity
+        if self.__similarity is not None:
+            return self.__similarity
+        return self.get_profile().get('similarity', pikuli.Settings.MinSimilarity)
+
+    def get_search_mode(self):
+        if self._search_mode is not None:
+            return self._search_mode
+        profile = self.get_profile()
+        mode = profile.get('search_mode')
+        if profile.get('channels') == 'gray' and mode in (None, 'plain'):
+            mode = 'gray'
+        return mode
+
+    def get_pyramid_depth(self):
+        if self._pyramid_depth is not None:
+            return self._pyramid_depth
+        return self.get_profile().get('pyramid_depth')
+
+    def get_scales(self):
+        if self._scales is not None:
+            return self._scales
+        profile = self.get_profile()
+        if 'scales' in profile:
+            return tuple(profile['scales'])
+        if profile.get('scale', 1.0) != 1.0:
+            return (profile['scale'],)
+        return ()
+
+    def get_method(self):
+        """ 'ccorr_normed' (`cv2.TM_CCORR_NORMED`) or 'sqdiff_normed' (`cv2.TM_SQDIFF_NORMED`). """
+        return self.get_profile().get('method', 'ccorr_normed')
+
+    def get_roi(self):
+        """ `(x, y, w, h)` in screen coordinates where the pattern is usually found or `None`. """
+        roi = self.get_profile().get('roi')
+        return None if roi is None else tuple(roi)
 
     def getW(self):
         self.w, self.h = self._w, self._h
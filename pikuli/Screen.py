@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
-from . import _functions, FailExit, geom
+from . import FailExit, geom
+from .capture import MonitorTopology
 
 
 class Screen(geom.region.Region):
@@ -15,18 +16,17 @@ class Screen(geom.region.Region):
         if self.n < 0:
             raise FailExit('Monitor number is less than zero.')
 
-        # Returns a sequence of tuples.
-        # For each monitor found, returns a handle to the monitor,
-        # device context handle, and intersection rectangle:
-        # (hMonitor, hdcMonitor, PyRECT).
-        self.__mon_hndl, _, mon_rect = \
-            _functions._screen_n_to_mon_descript(self.n)
-
-        super(Screen, self).__init__(mon_rect[0],
-                                     mon_rect[1],
-                                     mon_rect[2] - mon_rect[0],
-                                     mon_rect[3] - mon_rect[1],
-                                     title='Screen ({})'.format(self.n))
+        # The monitors are enumerated once per layout (see pikuli.capture.topology); here the cached
+        # rectangle is taken. Screen 0 is the whole virtual desktop.
+        x, y, w, h = MonitorTopology.screen_rect(self.n)
+        self.generation = MonitorTopology.generation
+
+        super(Screen, self).__init__(x, y, w, h, title='Screen ({})'.format(self.n))
+
+    def is_actual(self):
+        ''' Whether the monitor layout is the same as at construction of this Screen. '''
+        MonitorTopology.monitors()
+        return self.generation == MonitorTopology.generation
 
     def __repr__(self):
         return '<Screen ({}) ({}, {}, {}, {})>'.format(
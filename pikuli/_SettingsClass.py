@@ -9,6 +9,50 @@ class SettingsClass(object):
     __def_IMG_ADDITION_PATH = []  # Пути, кроме текущего и мб еще какого-то подобного
     __def_MinSimilarity = 0.995  # Почти устойчиво с 0.995, но однажны не нашел узелок для контура. 0.700 -- будет найдено в каждом пикселе (порог надо поднимать выше).
     __def_FindFailedDir = os.path.join(tempfile.gettempdir(), 'find_failed')
+    __def_PatternCacheMaxBytes = 256 * 1024 * 1024  # Ограничение на суммарный размер декодированных картинок в pikuli.pattern_cache.
+
+    __def_ReplayFrames = None  # Файл(ы) или папка со скриншотами для источника кадров 'file' (см. pikuli.capture).
+    __def_CaptureServiceFps = 10  # Частота кадров фонового захвата экрана pikuli.capture.CaptureService.
+    __def_CaptureServiceRingSize = 8  # Число заранее выделенных кадров в кольцевом буфере CaptureService.
+    __def_MonitorCheckInterval = 0.5  # Не на Windows раскладка мониторов (pikuli.capture.MonitorTopology) сверяется с текущей не чаще, чем раз в столько секунд.
+    __def_PixelProbeCell = 32  # pikuli.capture.probe_pixels(): точки в одной клетке сетки с таким шагом снимаются одним прямоугольником.
+    __def_PixelProbeMaxRects = 16  # Если прямоугольников больше, то снимается один, охватывающий все точки.
+
+    # Поиск шаблонов (см. pikuli.matching):
+    __def_SearchMode = 'plain'  # Режим поиска по умолчанию для Pattern, у которых режим не задан явно: 'plain', 'pyramid', 'gray' и др. (см. pikuli.matching.SEARCH_MODES; при similarity 1.0 -- 'exact').
+    __def_PyramidMaxDepth = 3  # Максимальное число уменьшений в 2 раза для режима 'pyramid'.
+    __def_PyramidMinPatternSide = 8  # Меньшая сторона уменьшенного шаблона не должна быть меньше этого числа пикселей.
+    __def_PyramidScoreSlack = 0.02  # На сколько (на каждый уровень пирамиды) понижаем порог similarity при грубом поиске.
+    __def_PyramidMaxCandidatesRatio = 0.05  # Если кандидатов больше этой доли грубой карты, то делаем обычный поиск в полном разрешении.
+    __def_GraySimilaritySlack = 0.01  # На сколько понижаем порог similarity при поиске кандидатов по яркости в режиме 'gray' (потом проверяем в цвете).
+    __def_Prefilter = True  # Отбрасывать позиции, где по среднему и дисперсии окна шаблон найтись не может, до вычисления корреляции.
+    __def_PrefilterMaxSurvivorsRatio = 0.1  # Если после отбрасывания осталось больше этой доли позиций, то корреляция считается везде.
+    __def_FftMinPatterns = 4  # С этого числа шаблонов, которые ищутся в одном скриншоте, спектр скриншота считается один раз на всех (None -- никогда).
+    __def_MatchThreads = min(8, os.cpu_count() or 1)  # Число потоков для одновременного поиска нескольких шаблонов в одном скриншоте.
+    __def_StripeMinPixels = 4 * 1024 * 1024  # Скриншоты от этого числа пикселей (несколько мониторов) сравниваются с шаблоном по полосам параллельно; None -- никогда.
+    __def_StripeRows = 256  # Высота полосы (в строках карты корреляции) при параллельном сравнении по полосам.
+    __def_StripeThreads = None  # Число потоков для полос; None -- по числу ядер.
+    __def_StoreMatchImage = True  # Хранить ли в Match картинку (срез скриншота, в котором нашли) для Match.is_image_changed().
+    __def_StoreImageDigest = False  # store_current_image() хранит вместо картинки хэши плиток (pikuli.matching.ImageDigest): меньше памяти, is_image_changed() и get_changed_rects() работают так же.
+    __def_DigestTileSize = 16  # Сторона плитки (в пикселях) в ImageDigest: с такой точностью get_changed_rects() указывает изменения.
+    __def_DigestThumbnailScale = None  # ImageDigest хранит и уменьшенную во столько раз картинку (get_stored_image()); None -- не хранит.
+    __def_PollMinDelay = 0.02  # Первая задержка между попытками поиска (см. pikuli.poll_scheduler.PollScheduler).
+    __def_PollMaxDelay = 1.0  # Задержки между попытками растут не больше, чем до этого значения.
+    __def_PollBackoff = 1.5  # Во сколько раз растет каждая следующая задержка.
+    __def_WatcherTolerance = 0  # pikuli.watcher.Watcher: пиксель изменился, если какой-то канал изменился больше, чем на это значение.
+    __def_WatcherInterval = 0.01  # Watcher проверяет области не чаще, чем раз в столько секунд.
+    __def_WatcherCpuBudget = 0.25  # Watcher занимает не больше этой доли одного ядра.
+    __def_CaptureServiceDetectChanges = True  # CaptureService сообщает ждущим (wait_for_change()) об изменении картинки.
+    __def_MultiScaleFactors = (1.0, 1.25, 1.5, 0.8, 2.0 / 3)  # Масштабы для Pattern.multiscale(): шаблон с экрана 100% на экранах 125%, 150% и наоборот.
+    __def_MultiScaleSimilaritySlack = 0.005  # На сколько понижаем similarity уменьшенной/увеличенной копии шаблона (потери при интерполяции).
+    __def_LocalityMargin = 16  # Find/wait сначала ищут шаблон в окне с таким отступом вокруг места, где он нашелся в прошлый раз.
+    __def_LastSeenIndexFile = None  # JSON-файл, из которого при первом поиске загружаются последние места шаблонов (см. pikuli.matching.locality).
+    __def_StableQuietMs = 300  # Region.wait_until_stable(): сколько миллисекунд картинка не должна меняться.
+    __def_StableTolerance = 0  # Region.wait_until_stable(): допустимое изменение канала уменьшенной картинки (0 -- любое изменение).
+    __def_StableThumbnailScale = 4  # Во сколько раз уменьшаются кадры при tolerance > 0.
+    __def_StablePollInterval = 0.02  # Период проверок Region.wait_until_stable().
+    __def_ChangeTileSize = 64  # Сторона плитки (в пикселях), по хэшам которых определяем, что изменилось на экране.
+    __def_NmsOverlap = 0.5  # Два попадания -- одно вхождение шаблона, если |dx| < NmsOverlap * w и |dy| < NmsOverlap * h.
 
     # Logger:
     __def_PatternURLTemplate = None  # Где искать картинки-шаблрны. Строка-шаблон с %s, куда подставляется имя файла с картинкой-шаблоном. К примеру: http://192.168.116.1/pikuli/pattern/ok_button.png
@@ -42,11 +42,13 @@ if os.name == 'nt':
 #    from .uia.control_wrappers import RegisteredControlClasses
 #    RegisteredControlClasses._register_all()
 
-try:
-    Settings.addImagePath(
-        os.path.dirname(os.path.abspath(sys.modules['__main__'].__file__)))
-except Exception as e:
-    logger.exception(e)
+# У `python -m ...` и интерактивной сессии `__main__` может не быть файла:
+_main_file = getattr(sys.modules.get('__main__'), '__file__', None)
+if _main_file is not None:
+    try:
+        Settings.addImagePath(os.path.dirname(os.path.abspath(_main_file)))
+    except Exception as e:
+        logger.exception(e)
 
 __all__ = [
     'Settings',
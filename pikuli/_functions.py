@@ -6,9 +6,7 @@
 import os
 import time
 import logging
-import mss
-from io import BytesIO
-from PIL import Image
+import threading
 
 if os.name == 'nt':
     import win32api
@@ -19,6 +17,7 @@ import numpy as np
 
 import pikuli
 from ._exceptions import FailExit, FindFailed
+from .capture import FrameSources, MonitorTopology, probe_pixels
 from pikuli import logger
 
 
@@ -64,24 +63,6 @@ def _screen_n_to_monitor_name(n):
     return r'\\.\DISPLAY%i' % n
 
 
-def _screen_n_to_mon_descript(n):
-    ''' Returns a sequence of tuples. For each monitor found, returns a handle to the monitor, device context handle, and intersection rectangle:
-    (hMonitor, hdcMonitor, PyRECT) '''
-    monitors = win32api.EnumDisplayMonitors(None, None)
-    if n >= 1:
-        for m in monitors:
-            if _monitor_hndl_to_screen_n(m[0]) == n:
-                break
-    elif n == 0:
-        # (x1, y1, x2, y2) = (m[2][0], m[2][1], m[2][2], m[2][3]) -- координаты углов экранов в системе кооринат большого виртуального экрана, где m -- элемнет monitors.
-        x_max = max(map(lambda m: m[2][2], monitors))
-        y_max = max(map(lambda m: m[2][3], monitors))
-        m = (None, None, (0, 0, x_max, y_max))
-    else:
-        raise FailExit('wrong screen number \'%s\'' % str(n))
-    return m
-
-
 def highlight_region(x, y, w, h, delay=0.5):
     def _cp_boundary(dest_dc, dest_x0, dest_y0, src_dc, src_x0, src_y0, w, h):
         win32gui.BitBlt(dest_dc, dest_x0+0,   dest_y0+0,   w,   1,   src_dc, src_x0,     src_y0,     win32con.SRCCOPY)
@@ -127,24 +108,38 @@ def highlight_region(x, y, w, h, delay=0.5):
     return
 
 
-def _take_screenshot(x, y, w, h, hwnd=None):
+# Буферы под скриншоты (см. reuse_buffer у _take_screenshot()) -- свои у каждого потока.
+_capture_buffers = threading.local()
+
+
+def _take_screenshot(x, y, w, h, hwnd=None, out=None, reuse_buffer=False, source=None):
     '''
     Получаем скриншот области:
         x, y  --  верхний левый угол прямоуголника в системе координат виртуального рабочего стола
         w, h  --  размеры прямоуголника
+        out   --  np.array формы (h, w, 3) и типа uint8, куда записать скриншот
+        reuse_buffer  --  записать скриншот в буфер текущего потока для этого источника (хранится один,
+                          последний; при других размерах заводится новый). Буфер перезаписывается следующим таким
+                          же вызовом в этом потоке, поэтому результат read-only и хранить его дольше нельзя.
+        source  --  источник кадров (см. pikuli.capture.FrameSources.resolve()); None -- источник текущего потока.
+
+    Возвращает BGR картинку (как cv2.imread) формы (h, w, 3).
     #
     '''
-    with mss.mss() as sct:
-        monitor = sct.monitors[0]
-        max_x = monitor["width"]
-        max_y = monitor["height"]
-        # проверка выхода заданного значения width за допустимый диапозон
-        w = w if x + w < max_x else max_x - x
-        # проверка выхода заданного значения height за допустимый диапозон
-        h = h if y + h < max_y else max_y - y
-        sct_img = sct.grab(dict(left=x, top=y, height=h, width=w))
-        scr = mss.tools.to_png(sct_img.rgb, sct_img.size, output="")
-        return np.array(Image.open(BytesIO(scr)).convert('RGB'))
+    source = FrameSources.resolve(source)
+    if out is None and reuse_buffer:
+        if not hasattr(_capture_buffers, 'buffers'):
+            _capture_buffers.buffers = {}
+        buffers = _capture_buffers.buffers
+        # grab() сам заменит буфер, если размеры не совпадают:
+        buffer = buffers.get(source)
+        if buffer is not None:
+            buffer.flags.writeable = True
+        img = source.grab(x, y, w, h, out=buffer)
+        img.flags.writeable = False  # Кто хранит картинку, тот ее копирует (см. Region._owned_image()).
+        buffers[source] = img
+        return img
+    return source.grab(x, y, w, h, out=out)
 
 
 """def _scr_num_of_point(x, y):
@@ -168,11 +163,18 @@ def __check_reg_in_single_screen(self):
 """
 
 
-def pixel_color_at(x, y, monitor_number=1):
+def pixel_color_at(x, y, monitor_number=None):
     return pixels_colors_at([(x, y)], monitor_number)[0]
 
 
-def pixels_colors_at(coords_tuple_list, monitor_number=1):
-    with mss.mss() as sct:
-        sct_img = sct.grab(sct.monitors[monitor_number])  # некст по умолчанию выводится на первый монитор
-        return list(map(lambda coord: sct_img.pixel(*coord), coords_tuple_list))
+def pixels_colors_at(coords_tuple_list, monitor_number=None):
+    '''
+    Цвета (RGB кортежи) пикселей. Снимаются не мониторы целиком, а только небольшие прямоугольники вокруг
+    групп близких точек (см. pikuli.capture.probe_pixels).
+        coords_tuple_list  --  список (x, y) в системе координат виртуального рабочего стола
+        monitor_number  --  если задан, то координаты отсчитываются от левого верхнего угла этого монитора (как в Screen(n))
+    '''
+    coords = np.asarray(coords_tuple_list, dtype=np.int64).reshape(-1, 2)
+    if monitor_number is not None:
+        coords = coords + MonitorTopology.screen_rect(monitor_number)[:2]
+    return [tuple(c) for c in probe_pixels(coords).tolist()]
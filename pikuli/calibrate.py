@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+"""
+Calibration of pattern profiles (see :mod:`pikuli.pattern_profile`). A pattern is searched in
+sample screenshots (full-desktop captures, so their coordinates are screen coordinates) with every
+candidate search mode and with `TM_SQDIFF_NORMED` (method 'sqdiff_normed', searched in the 'plain'
+mode only, so it is a candidate at scale 1 only); the fastest mode and method which find the pattern
+at the reference position in every sample are written to `<image>.json` together with the detected
+scale and the ROI around the hits.
+
+    python -m pikuli.calibrate button.png shot1.png shot2.png [--similarity 0.99] [--repeat 3]
+"""
+
+import argparse
+import time
+
+import cv2
+
+import pikuli
+from pikuli import matching
+from .Pattern import Pattern
+from ._exceptions import FailExit
+from .pattern_profile import save_profile
+
+
+CANDIDATE_MODES = ('plain', 'pyramid', 'gray', 'fft', 'exact')
+POSITION_TOLERANCE = 1  # Pixels; coarse-to-fine modes may shift a hit on a plateau of equal scores.
+
+
+def _best(field, pattern):
+    (p, xs, ys, scores) = matching.multiscale_search(field, pattern, search=matching.search_best)
+    return (int(xs[0]), int(ys[0]), p.getW(), p.getH()) if len(xs) else None
+
+
+def _best_sqdiff(field, pattern):
+    """ The best hit as :class:`pikuli.Region` finds it with method 'sqdiff_normed'. """
+    res = cv2.matchTemplate(field, pattern.get_image(), cv2.TM_SQDIFF_NORMED)
+    (min_val, _, (x, y), _) = cv2.minMaxLoc(res)
+    return (x, y, pattern.getW(), pattern.getH()) if min_val < 1.0 - pattern.getSimilarity() else None
+
+
+def _detect_scale(image_path, similarity, fields):
+    """ The first of `Settings.MultiScaleFactors` at which the pattern is found in every sample. """
+    for scale in pikuli.Settings.MultiScaleFactors:
+        pattern = Pattern(image_path, similarity, search_mode='plain', scales=(scale,))
+        hits = [_best(f, pattern) for f in fields]
+        if all(hits):
+            return scale, hits
+    raise FailExit('pattern {} is not found in all samples at any of scales {}'.format(
+        image_path, pikuli.Settings.MultiScaleFactors))
+
+
+def calibrate(image_path, screenshots, similarity=None, repeat=3, roi_margin=64, write=True):
+    """
+    :param screenshots: Paths of sample screenshots; each of them should contain the pattern.
+    :param repeat: Timing of every mode is the best of `repeat` runs over all samples.
+    :param roi_margin: Margin (pixels) of the ROI around the union of hits; `None` -- no ROI in the profile.
+    :return: The profile (dict); it is also saved next to the image if `write`.
+    """
+    fields = []
+    for path in screenshots:
+        field = cv2.imread(path)
+        if field is None:
+            raise FailExit('can not read sample screenshot {}'.format(path))
+        fields.append(field)
+    if not fields:
+        raise FailExit('no sample screenshots')
+
+    image_path = Pattern(image_path).getFilename(full_path=True)
+    similarity = Pattern(image_path, similarity, scales=()).getSimilarity()
+    (scale, reference) = _detect_scale(image_path, similarity, fields)
+
+    # Candidates: name in the timings -> (method, search mode).
+    candidates = {mode: ('ccorr_normed', mode) for mode in CANDIDATE_MODES if mode != 'exact' or similarity >= 1.0}
+    if scale == 1.0:
+        candidates['sqdiff_normed'] = ('sqdiff_normed', 'plain')
+
+    timings = {}
+    for name, (method, mode) in candidates.items():
+        pattern = Pattern(image_path, similarity, search_mode=mode, scales=(scale,))
+        find = _best_sqdiff if method == 'sqdiff_normed' else _best
+        passed = True
+        elapsed = None
+        for _ in range(repeat):
+            t = time.perf_counter()
+            hits = [find(f, pattern) for f in fields]
+            run = time.perf_counter() - t
+            elapsed = run if elapsed is None else min(elapsed, run)
+            if not all(h is not None and abs(h[0] - r[0]) <= POSITION_TOLERANCE and abs(h[1] - r[1]) <= POSITION_TOLERANCE
+                       for h, r in zip(hits, reference)):
+                passed = False
+                break
+        if passed:
+            timings[name] = elapsed
+        pikuli.logger.info('pikuli.calibrate: {} in mode {!r}, method {!r}: {}'.format(
+            image_path, mode, method, '%.4f s' % elapsed if passed else 'failed'))
+
+    (best_method, best_mode) = candidates[min(timings, key=timings.get)]
+    profile = {
+        'similarity': similarity,
+        'method': best_method,
+        'search_mode': best_mode,
+        'channels': 'gray' if best_mode == 'gray' else 'color',
+        'calibration': {'samples': len(fields), 'seconds': timings},
+    }
+    if best_mode == 'pyramid':
+        profile['pyramid_depth'] = matching.pattern_pyramid_depth(Pattern(image_path, similarity, scales=()).scaled(scale))
+    if scale != 1.0:
+        profile['scale'] = scale
+    if roi_margin is not None:
+        x0 = min(r[0] for r in reference) - roi_margin
+        y0 = min(r[1] for r in reference) - roi_margin
+        x1 = max(r[0] + r[2] for r in reference) + roi_margin
+        y1 = max(r[1] + r[3] for r in reference) + roi_margin
+        profile['roi'] = [max(0, x0), max(0, y0), x1 - max(0, x0), y1 - max(0, y0)]
+
+    if write:
+        path = save_profile(image_path, profile)
+        pikuli.logger.info('pikuli.calibrate: profile of {} is written to {}'.format(image_path, path))
+    return profile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pikuli.calibrate', description=__doc__.strip().split('\n\n')[0])
+    parser.add_argument('pattern', help='pattern image')
+    parser.add_argument('screenshots', nargs='+', help='sample screenshots containing the pattern')
+    parser.add_argument('--similarity', type=float, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--roi-margin', type=int, default=64)
+    parser.add_argument('--no-roi', action='store_true', help='do not write the ROI hint')
+    parser.add_argument('--dry-run', action='store_true', help='print the profile without writing it')
+    args = parser.parse_args(argv)
+
+    profile = calibrate(args.pattern, args.screenshots, args.similarity, args.repeat,
+                        None if args.no_roi else args.roi_margin, write=not args.dry_run)
+    print(profile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+"""
+Screen capture backends (frame sources). :func:`pikuli._functions._take_screenshot` and so
+:meth:`pikuli.Region.get_raw_screenshot` grab through the frame source selected for the current
+thread or for the particular :class:`pikuli.Region`.
+"""
+
+import os
+
+import pikuli
+from .frame_source import FrameSource, FrameSources
+from .array_source import ArrayFrameSource, SyntheticFrameSource, FileFrameSource
+from .topology import MonitorTopology
+from .mss_source import MssFrameSource
+from .service import CaptureService, Frame
+from .probe import probe_pixels, probe_rects
+
+
+FrameSources.register('mss', MssFrameSource, default=True)
+FrameSources.register('synthetic', SyntheticFrameSource)
+FrameSources.register('file', lambda: FileFrameSource(pikuli.Settings.ReplayFrames))
+
+if os.name == 'posix':
+    from .x11_shm_source import X11ShmFrameSource
+    FrameSources.register('x11shm', X11ShmFrameSource)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+from pikuli import FailExit
+from .frame_source import FrameSource
+
+
+class ArrayFrameSource(FrameSource):
+    """ Frames are numpy arrays covering the virtual desktop starting from its `(0, 0)` corner. """
+
+    def __init__(self):
+        self._frame = None
+
+    def get_frame(self):
+        return self._frame
+
+    def get_desktop_rect(self):
+        frame = self.get_frame()
+        return (0, 0, frame.shape[1], frame.shape[0])
+
+    def grab(self, x, y, w, h, out=None):
+        frame = self.get_frame()
+        if frame is None:
+            raise FailExit('{!r} has no frame to grab from'.format(self))
+        max_h, max_w = frame.shape[:2]
+        x0, y0 = max(0, x), max(0, y)
+        return self._output(frame[y0:min(y + h, max_h), x0:min(x + w, max_w)], out)
+
+
+class SyntheticFrameSource(ArrayFrameSource):
+    """
+    In-memory desktop. Its picture is drawn by the test code, so computer vision code can be run
+    and benchmarked without a display.
+    """
+
+    def __init__(self, width=1920, height=1080, color=(0, 0, 0)):
+        super(SyntheticFrameSource, self).__init__()
+        self._frame = np.empty((height, width, 3), np.uint8)
+        self._frame[:] = color
+
+    @property
+    def frame(self):
+        return self._frame
+
+    def fill(self, x, y, w, h, color):
+        """ `color` is BGR. """
+        self._frame[y:y + h, x:x + w] = color
+
+    def paste(self, img, x, y):
+        """ Draws BGR `img` (e.g. :meth:`pikuli.Pattern.get_image`) with its top-left corner at `(x, y)`. """
+        h, w = img.shape[:2]
+        self._frame[y:y + h, x:x + w] = img
+
+
+class FileFrameSource(ArrayFrameSource):
+    """
+    Replays desktop screenshots stored as image files (or one file).
+
+    :param paths: File name, list of file names or a directory (all its files in sorted order).
+    :param interval: Seconds per frame. `None` -- the frame is changed by :meth:`next_frame` only.
+    :param loop: Start over after the last frame; otherwise the last frame stays.
+    """
+
+    def __init__(self, paths, interval=None, loop=True):
+        super(FileFrameSource, self).__init__()
+        if isinstance(paths, str):
+            if os.path.isdir(paths):
+                paths = [os.path.join(paths, f) for f in sorted(os.listdir(paths))]
+            else:
+                paths = [paths]
+        self._frames = []
+        for path in paths:
+            img = cv2.imread(path)
+            if img is None:
+                raise FailExit('FileFrameSource: can not read image file {!r}'.format(path))
+            self._frames.append(img)
+        if not self._frames:
+            raise FailExit('FileFrameSource: no frames in {!r}'.format(paths))
+        self._interval = interval
+        self._loop = loop
+        self._index = 0
+        self._start_time = time.monotonic()
+
+    def _frame_index(self):
+        if self._interval is None:
+            return self._index
+        index = self._index + int((time.monotonic() - self._start_time) / self._interval)
+        if self._loop:
+            return index % len(self._frames)
+        return min(index, len(self._frames) - 1)
+
+    def get_frame(self):
+        return self._frames[self._frame_index()]
+
+    def next_frame(self):
+        index = self._frame_index() + 1
+        self._index = index % len(self._frames) if self._loop else min(index, len(self._frames) - 1)
+        self._start_time = time.monotonic()
+
+    def rewind(self):
+        self._index = 0
+        self._start_time = time.monotonic()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from pikuli import FailExit
+
+
+class FrameSource(object):
+    """
+    Base class of screen capture backends. A frame source returns BGR pictures (as `cv2.imread`
+    does) of rectangles given in the virtual desktop coordinates.
+    """
+
+    def grab(self, x, y, w, h, out=None):
+        """
+        :param out: Optional `np.array` of shape `(h, w, 3)` and type `uint8` to write into.
+        :return: BGR `np.array` of shape `(h', w', 3)`. The rectangle is clipped by the
+                 desktop, so `h' <= h` and `w' <= w`.
+        """
+        raise NotImplementedError
+
+    def get_desktop_rect(self):
+        """ Returns `(x, y, w, h)` of the whole virtual desktop as this source sees it. """
+        raise NotImplementedError
+
+    def get_monitor_rects(self):
+        """ Returns the list of `(x, y, w, h)` of the monitors; by default the desktop is one monitor. """
+        return [tuple(self.get_desktop_rect())]
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _output(bgr, out):
+        """ Copies `bgr` (usually a view of a backend buffer) into `out` if it fits or into a new array. """
+        if out is None or out.shape != bgr.shape:
+            return bgr.copy()
+        np.copyto(out, bgr)
+        return out
+
+    def __repr__(self):
+        return '<{}>'.format(type(self).__name__)
+
+
+class FrameSources(object):
+    """
+    Registry of frame sources. The current source is selected per thread; a :class:`pikuli.Region`
+    may override it with its own `frame_source`.
+
+    Permanent selection for the current thread::
+
+        FrameSources.set_source('x11shm')
+
+    Temporary selection::
+
+        with FrameSources.using(SyntheticFrameSource(1920, 1080)):
+            ...
+    """
+
+    default = None
+    _collection = {}
+    _local = threading.local()
+
+    @classmethod
+    def register(cls, name, factory, default=False):
+        """ `factory()` should return a new :class:`FrameSource`. """
+        cls._collection[name] = factory
+        if default or cls.default is None:
+            cls.default = name
+
+    @classmethod
+    def names(cls):
+        return sorted(cls._collection)
+
+    @classmethod
+    def _thread_instances(cls):
+        if not hasattr(cls._local, 'instances'):
+            cls._local.instances = {}
+            cls._local.current = None
+        return cls._local.instances
+
+    @classmethod
+    def resolve(cls, source=None):
+        """
+        Returns a :class:`FrameSource` instance. `source` may be an instance (returned as is), a
+        registered name (the instance of this name owned by the current thread) or `None` (the
+        current source of the thread).
+        """
+        instances = cls._thread_instances()
+        if source is None:
+            source = cls._local.current
+            if source is None:
+                source = cls.default
+        if isinstance(source, FrameSource):
+            return source
+        if source not in cls._collection:
+            raise FailExit('Unknown frame source {!r}. Registered: {}'.format(source, cls.names()))
+        if source not in instances:
+            instances[source] = cls._collection[source]()
+        return instances[source]
+
+    @classmethod
+    def get_source(cls):
+        return cls.resolve(None)
+
+    @classmethod
+    def get_selection(cls):
+        """ What is selected for the current thread: a name, an instance or `None` (default). """
+        cls._thread_instances()
+        return cls._local.current
+
+    @classmethod
+    def set_source(cls, source):
+        """ Selects the source of the current thread: a registered name, an instance or `None` (default). """
+        if source is not None:
+            cls.resolve(source)  # Validates the name and creates the thread instance beforehand.
+        cls._thread_instances()
+        cls._local.current = source
+
+    @classmethod
+    @contextmanager
+    def using(cls, source):
+        cls._thread_instances()
+        bckp_source = cls._local.current
+        cls.set_source(source)
+        try:
+            yield cls.resolve(source)
+        finally:
+            cls._local.current = bckp_source
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import mss
+import numpy as np
+
+from .frame_source import FrameSource
+from .topology import MonitorTopology
+
+
+class MssFrameSource(FrameSource):
+    """
+    Capture by means of `mss`. One instance (so one mss session) is used per thread: mss sessions
+    can not be shared between threads. The raw BGRA buffer is viewed by numpy without any encoding;
+    the alpha channel is dropped by a single copy. The desktop and monitor rectangles come from
+    the cached :class:`MonitorTopology`.
+    """
+
+    def __init__(self):
+        self._sct = mss.mss()
+
+    def grab(self, x, y, w, h, out=None):
+        (dx, dy, dw, dh) = MonitorTopology.desktop_rect()
+        # проверка выхода заданного значения width за допустимый диапозон
+        w = min(w, dx + dw - x)
+        # проверка выхода заданного значения height за допустимый диапозон
+        h = min(h, dy + dh - y)
+        sct_img = self._sct.grab(dict(left=x, top=y, height=h, width=w))
+        bgra = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+        return self._output(bgra[:, :, :3], out)
+
+    def get_desktop_rect(self):
+        return MonitorTopology.desktop_rect()
+
+    def get_monitor_rects(self):
+        return MonitorTopology.monitor_rects()
+
+    def close(self):
+        self._sct.close()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+Sparse pixel probes. Colors of a few pixels (status LEDs, progress bar ends, anchor points of a
+window) are read by capturing small bounding rectangles around groups of nearby points instead
+of whole monitors. Coordinates are in the virtual desktop system, so points on any monitor may
+be probed in one call.
+"""
+
+import numpy as np
+
+import pikuli
+from pikuli import FailExit
+from .frame_source import FrameSources
+
+
+def probe_rects(coords, cell=None, max_rects=None):
+    """
+    Groups points into rectangles to capture.
+
+    Points falling into the same cell of a `cell x cell` grid share one rectangle: the bounding
+    box of those points. If there are more than `max_rects` groups, the single bounding box of
+    all points is returned instead, as each capture has its own fixed cost.
+
+    :param coords: `np.array` of shape `(n, 2)` with `(x, y)` of the points.
+    :param cell: Grid step in pixels. `None` -- `Settings.PixelProbeCell`.
+    :param max_rects: `None` -- `Settings.PixelProbeMaxRects`.
+    :return: List of `(x, y, w, h, indices)`, where `indices` are the numbers of points inside.
+    """
+    if cell is None:
+        cell = pikuli.Settings.PixelProbeCell
+    if max_rects is None:
+        max_rects = pikuli.Settings.PixelProbeMaxRects
+    if len(coords) == 0:
+        return []
+
+    cells = coords // cell
+    _, groups = np.unique(cells, axis=0, return_inverse=True)
+    groups = groups.reshape(-1)
+    if groups.max() + 1 > max_rects:
+        groups = np.zeros(len(coords), dtype=groups.dtype)
+
+    rects = []
+    for g in range(groups.max() + 1):
+        indices = np.flatnonzero(groups == g)
+        pts = coords[indices]
+        (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+        rects.append((int(x0), int(y0), int(x1 - x0 + 1), int(y1 - y0 + 1), indices))
+    return rects
+
+
+def probe_pixels(coords, source=None, bgr=False):
+    """
+    Colors of pixels at `coords` (a sequence of `(x, y)` in the virtual desktop coordinates).
+
+    :param source: Frame source (see :meth:`FrameSources.resolve`); `None` -- the source of the thread.
+    :param bgr: Channel order of the result. By default it is RGB, as :class:`pikuli.Color` has.
+    :return: `np.array` of shape `(n, 3)` and type `uint8`, row `i` is the color of `coords[i]`.
+    """
+    coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+    source = FrameSources.resolve(source)
+    colors = np.empty((len(coords), 3), dtype=np.uint8)
+    for (x, y, w, h, indices) in probe_rects(coords):
+        img = source.grab(x, y, w, h)
+        if img.shape[:2] != (h, w):
+            raise FailExit('probe_pixels(): some of points {} are out of the desktop {} of {!r}'.format(
+                [tuple(p) for p in coords[indices].tolist()], source.get_desktop_rect(), source))
+        pts = coords[indices]
+        colors[indices] = img[pts[:, 1] - y, pts[:, 0] - x]
+    return colors if bgr else colors[:, ::-1]
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""
+Background capture of the whole virtual desktop into a ring of preallocated frames. While the
+service runs, :class:`pikuli.Region` crops its fields from the newest frame instead of grabbing
+them itself, so the capture cost depends on the frame rate and not on the number of waiters.
+
+Crops are copies: a ring slot is rewritten `ring_size` frames later, while a search in a large
+field may take longer than that. The copy costs much less than a grab of its own.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+import pikuli
+from pikuli import logger
+from pikuli.matching.tiles import ChangeTracker
+from .frame_source import FrameSources
+
+
+class Frame(object):
+    """ A ring slot: the picture of the desktop, its capture time (`time.monotonic()`) and number. """
+
+    __slots__ = ('image', 'timestamp', 'seq')
+
+    def __init__(self, image):
+        self.image = image
+        self.timestamp = None
+        self.seq = 0
+
+
+class CaptureService(object):
+    """
+    Usage::
+
+        with CaptureService(fps=20):
+            ...  # All Regions (with the default frame source) use the shared frames.
+    """
+
+    _active = None
+    _active_lock = threading.Lock()
+
+    def __init__(self, fps=None, ring_size=None, source=None, rect=None):
+        """
+        :param fps: Frames per second. `None` -- `Settings.CaptureServiceFps`.
+        :param ring_size: Number of preallocated frames. `None` -- `Settings.CaptureServiceRingSize`.
+        :param source: Frame source (see :meth:`FrameSources.resolve`) used by the capture thread.
+        :param rect: `(x, y, w, h)` to capture. `None` -- the whole virtual desktop of the source.
+        """
+        self._fps = float(fps or pikuli.Settings.CaptureServiceFps)
+        self._ring_size = max(2, int(ring_size or pikuli.Settings.CaptureServiceRingSize))
+        self._source = source
+        self._rect = rect
+        self._frames = None
+        self._latest = None
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._started_event = threading.Event()
+        self._thread = None
+        self._error = None
+        self._tracker = ChangeTracker() if pikuli.Settings.CaptureServiceDetectChanges else None
+        self._change_time = None
+
+    @classmethod
+    def get_active(cls):
+        """ Returns the running service or `None`. """
+        return cls._active
+
+    @property
+    def rect(self):
+        return self._rect
+
+    def start(self):
+        with CaptureService._active_lock:
+            if CaptureService._active is not None:
+                raise pikuli.FailExit('{!r} is running already'.format(CaptureService._active))
+            self._stop_event.clear()
+            self._started_event.clear()
+            self._thread = threading.Thread(target=self._run, name='pikuli-capture-service', daemon=True)
+            self._thread.start()
+            self._started_event.wait()
+            if self._error is not None:
+                raise pikuli.FailExit('CaptureService failed to start: {!s}'.format(self._error))
+            CaptureService._active = self
+        return self
+
+    def stop(self):
+        with CaptureService._active_lock:
+            if CaptureService._active is self:
+                CaptureService._active = None
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        try:
+            source = FrameSources.resolve(self._source)
+            if self._rect is None:
+                self._rect = tuple(source.get_desktop_rect())
+            first = source.grab(*self._rect)
+            self._rect = self._rect[:2] + (first.shape[1], first.shape[0])
+            self._frames = [Frame(np.empty_like(first)) for _ in range(self._ring_size)]
+            np.copyto(self._frames[0].image, first)
+            self._publish(self._frames[0], 1)
+        except Exception as ex:
+            self._error = ex
+            self._started_event.set()
+            return
+        self._started_event.set()
+
+        interval = 1.0 / self._fps
+        index, seq = 0, 1
+        while not self._stop_event.wait(max(0.0, self._latest.timestamp + interval - time.monotonic())):
+            index = (index + 1) % self._ring_size
+            frame = self._frames[index]
+            try:
+                image = source.grab(*self._rect, out=frame.image)
+            except Exception:
+                logger.exception('pikuli.CaptureService: capture failed')
+                continue
+            if image is not frame.image:  # The desktop has been changed; the source gave a new array.
+                frame.image = image
+            seq += 1
+            self._publish(frame, seq)
+
+    def _publish(self, frame, seq):
+        changed = self._tracker is None or self._tracker.update(frame.image) != []
+        with self._cond:
+            frame.timestamp = time.monotonic()
+            frame.seq = seq
+            self._latest = frame
+            if changed:
+                self._change_time = frame.timestamp
+            self._cond.notify_all()
+
+    def wait_for_change(self, since, timeout=None):
+        """
+        Waits up to `timeout` seconds for a frame captured after `since` (`time.monotonic()`
+        scale) which differs from its predecessor. Without change detection
+        (`Settings.CaptureServiceDetectChanges`) every new frame counts as changed.
+        Returns `True` if there is such a frame.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._change_time is not None and self._change_time > since, timeout)
+
+    def get_frame(self, newer_than=None, timeout=None):
+        """
+        Returns the newest :class:`Frame`. If `newer_than` is given, waits up to `timeout`
+        seconds for a frame captured after that moment (`time.monotonic()` scale); returns `None`
+        if there is no such frame in time.
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                    lambda: newer_than is None or self._latest.timestamp > newer_than, timeout):
+                return None
+            return self._latest
+
+    def captures(self, source):
+        """
+        Whether the frames come from `source`: a registered name, an instance or `None` (the
+        default source), as :meth:`FrameSources.resolve` takes it.
+        """
+        mine = FrameSources.default if self._source is None else self._source
+        other = FrameSources.default if source is None else source
+        return mine is other or (isinstance(mine, str) and mine == other)
+
+    def contains(self, x, y, w, h):
+        rx, ry, rw, rh = self._rect
+        return rx <= x and ry <= y and x + w <= rx + rw and y + h <= ry + rh
+
+    def crop(self, x, y, w, h, newer_than=None, timeout=None):
+        """
+        Returns `(image, timestamp)`, where `image` is a copy of the rectangle in the newest frame
+        (see :meth:`get_frame`), or `None`.
+        """
+        frame = self.get_frame(newer_than, timeout)
+        if frame is None:
+            return None
+        x, y, w, h = int(x), int(y), int(w), int(h)
+        rx, ry = self._rect[:2]
+        return frame.image[y - ry:y - ry + h, x - rx:x - rx + w].copy(), frame.timestamp
+
+    def __repr__(self):
+        return '<CaptureService {} fps, {} frames of {}>'.format(self._fps, self._ring_size, self._rect)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+Process-wide cache of the monitor layout. Enumeration of monitors (`EnumDisplayMonitors` plus
+`GetMonitorInfo` for each one on Windows, XRandR through `mss` elsewhere) is done once; then
+:class:`pikuli.Screen`, region clipping and the `mss` frame source read the cached rectangles.
+
+The cached layout is checked against a cheap signature of the current one:
+
+* on Windows -- the virtual desktop rectangle and the number of monitors (`GetSystemMetrics`), on
+  every read;
+* on X11 -- the size of the root window and the RandR monitors (`XRRGetMonitors`, one round trip
+  over a connection kept open), at most every `Settings.MonitorCheckInterval` seconds;
+* elsewhere (or without `libX11`) the monitors are enumerated again at the same interval.
+
+So hot-plugging or rearranging monitors is noticed without calls of :meth:`MonitorTopology.invalidate`.
+Each new layout increments :attr:`MonitorTopology.generation`, so holders of derived data can
+tell that it is stale.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import threading
+import time
+
+import mss
+
+import pikuli
+from pikuli import FailExit
+
+if os.name == 'nt':
+    import win32api
+
+    SM_XVIRTUALSCREEN = 76
+    SM_YVIRTUALSCREEN = 77
+    SM_CXVIRTUALSCREEN = 78
+    SM_CYVIRTUALSCREEN = 79
+    SM_CMONITORS = 80
+
+
+class _XRRMonitorInfo(ctypes.Structure):
+    _fields_ = [
+        ('name', ctypes.c_ulong),
+        ('primary', ctypes.c_int),
+        ('automatic', ctypes.c_int),
+        ('noutput', ctypes.c_int),
+        ('x', ctypes.c_int),
+        ('y', ctypes.c_int),
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('mwidth', ctypes.c_int),
+        ('mheight', ctypes.c_int),
+        ('outputs', ctypes.c_void_p),
+    ]
+
+
+class _X11Signature(object):
+    """ Root window geometry and RandR monitors (if RandR >= 1.5) over an own connection to the X server. """
+
+    def __init__(self):
+        path = ctypes.util.find_library('X11')
+        if path is None:
+            raise FailExit('libX11 is not found')
+        xlib = self._xlib = ctypes.CDLL(path)
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        u = ctypes.POINTER(ctypes.c_uint)
+        i = ctypes.POINTER(ctypes.c_int)
+        xlib.XGetGeometry.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong), i, i, u, u, u, u]
+
+        self._display = xlib.XOpenDisplay(None)
+        if not self._display:
+            raise FailExit('can not open X display')
+        self._root = xlib.XDefaultRootWindow(self._display)
+        self._lock = threading.Lock()
+
+        # XRRGetMonitors() appeared in RandR 1.5; calling it on an older server is a fatal X error.
+        self._xrandr = None
+        path = ctypes.util.find_library('Xrandr')
+        if path is not None:
+            xrandr = ctypes.CDLL(path)
+            major, minor = ctypes.c_int(), ctypes.c_int()
+            xrandr.XRRQueryVersion.argtypes = [ctypes.c_void_p, i, i]
+            if hasattr(xrandr, 'XRRGetMonitors') and xrandr.XRRQueryVersion(
+                    self._display, ctypes.byref(major), ctypes.byref(minor)) and (major.value, minor.value) >= (1, 5):
+                xrandr.XRRGetMonitors.restype = ctypes.POINTER(_XRRMonitorInfo)
+                xrandr.XRRGetMonitors.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, i]
+                xrandr.XRRFreeMonitors.argtypes = [ctypes.POINTER(_XRRMonitorInfo)]
+                self._xrandr = xrandr
+
+    def __call__(self):
+        with self._lock:
+            root = ctypes.c_ulong()
+            x, y = ctypes.c_int(), ctypes.c_int()
+            w, h, border, depth = ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint()
+            self._xlib.XGetGeometry(self._display, self._root, ctypes.byref(root), ctypes.byref(x), ctypes.byref(y),
+                                    ctypes.byref(w), ctypes.byref(h), ctypes.byref(border), ctypes.byref(depth))
+            signature = [(w.value, h.value)]
+            if self._xrandr is not None:
+                n = ctypes.c_int()
+                info = self._xrandr.XRRGetMonitors(self._display, self._root, 1, ctypes.byref(n))
+                if info:
+                    signature += [(m.x, m.y, m.width, m.height) for m in info[:n.value]]
+                    self._xrandr.XRRFreeMonitors(info)
+            return tuple(signature)
+
+
+_x11_signature = None
+
+
+def _signature():
+    ''' Cheap fingerprint of the layout. Where there is no such thing, the layout itself is returned. '''
+    global _x11_signature
+    if os.name == 'nt':
+        return tuple(win32api.GetSystemMetrics(i) for i in (
+            SM_XVIRTUALSCREEN, SM_YVIRTUALSCREEN, SM_CXVIRTUALSCREEN, SM_CYVIRTUALSCREEN, SM_CMONITORS))
+    if _x11_signature is None and os.environ.get('DISPLAY'):
+        try:
+            _x11_signature = _X11Signature()
+        except Exception as ex:
+            pikuli.logger.debug('pikuli.capture.topology: no cheap X11 layout signature ({!s})'.format(ex))
+            _x11_signature = False
+    if _x11_signature:
+        return _x11_signature()
+    return _enumerate()
+
+
+def _enumerate():
+    ''' Returns `{n: (x, y, w, h)}`: `0` -- the virtual desktop, `1...` -- monitors. '''
+    if os.name == 'nt':
+        # Monitors are numbered as Windows does: \\.\DISPLAY1, \\.\DISPLAY2 and so on.
+        monitors = {}
+        for (hmon, _, (x1, y1, x2, y2)) in win32api.EnumDisplayMonitors(None, None):
+            device = win32api.GetMonitorInfo(hmon)['Device']
+            n = int(device[len(r'\\.\DISPLAY'):])
+            if n <= 0:
+                raise FailExit('can not obtain Screen number from monitor device name {!r}'.format(device))
+            monitors[n] = (x1, y1, x2 - x1, y2 - y1)
+        x1 = min(r[0] for r in monitors.values())
+        y1 = min(r[1] for r in monitors.values())
+        x2 = max(r[0] + r[2] for r in monitors.values())
+        y2 = max(r[1] + r[3] for r in monitors.values())
+        monitors[0] = (x1, y1, x2 - x1, y2 - y1)
+        return monitors
+
+    with mss.mss() as sct:
+        return {n: (m['left'], m['top'], m['width'], m['height']) for n, m in enumerate(sct.monitors)}
+
+
+class MonitorTopology(object):
+
+    generation = 0
+    _monitors = None
+    _signature = None
+    _checked_at = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _check_due(cls):
+        ''' Whether the layout should be compared with the signature now (on Windows -- always, it is cheap). '''
+        if os.name == 'nt':
+            return True
+        now = time.monotonic()
+        if cls._checked_at is not None and now - cls._checked_at < pikuli.Settings.MonitorCheckInterval:
+            return False
+        cls._checked_at = now
+        return True
+
+    @classmethod
+    def invalidate(cls):
+        """ Forgets the layout; the next read enumerates the monitors again. """
+        with cls._lock:
+            cls._monitors = None
+
+    @classmethod
+    def monitors(cls):
+        """ Returns `{n: (x, y, w, h)}` in the virtual desktop coordinates: `0` -- the whole desktop, `1...` -- monitors. """
+        monitors = cls._monitors
+        if monitors is not None and not cls._check_due():
+            return monitors
+        signature = _signature()
+        if monitors is not None and signature == cls._signature:
+            return monitors
+        with cls._lock:
+            if cls._monitors is None or signature != cls._signature:
+                monitors = _enumerate()
+                if monitors != cls._monitors:
+                    cls.generation += 1
+                cls._monitors, cls._signature = monitors, signature
+                cls._checked_at = time.monotonic()
+            return cls._monitors
+
+    @classmethod
+    def screen_rect(cls, n):
+        monitors = cls.monitors()
+        if n not in monitors:
+            raise FailExit('wrong screen number {!r}; there are screens {}'.format(n, sorted(monitors)))
+        return monitors[n]
+
+    @classmethod
+    def desktop_rect(cls):
+        return cls.monitors()[0]
+
+    @classmethod
+    def monitor_rects(cls):
+        """ Rectangles of the monitors `1...` in order of their numbers. """
+        monitors = cls.monitors()
+        return [monitors[n] for n in sorted(monitors) if n != 0]
+
+    @classmethod
+    def monitor_at(cls, x, y):
+        """ Number of the monitor containing the point or `None`. """
+        for n, (mx, my, mw, mh) in sorted(cls.monitors().items()):
+            if n != 0 and mx <= x < mx + mw and my <= y < my + mh:
+                return n
+        return None
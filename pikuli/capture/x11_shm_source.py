@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+"""
+X11 capture through the MIT-SHM extension. The server writes pixels directly into a System V
+shared memory segment which is kept for the life of the source and only grows when a bigger
+rectangle is requested. `python-xlib` has no MIT-SHM support, so `libX11` and `libXext` are used
+by means of `ctypes`.
+"""
+
+import ctypes
+import ctypes.util
+from collections import OrderedDict
+
+import numpy as np
+
+from pikuli import FailExit
+from .frame_source import FrameSource
+
+
+ZPixmap = 2
+AllPlanes = ctypes.c_ulong(-1).value
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+# XImage headers over the segment are kept for this many recently grabbed sizes:
+_MAX_IMAGES = 8
+
+
+class XImage(ctypes.Structure):
+    # The leading part of `struct _XImage` from Xlib.h; the rest is not used here.
+    _fields_ = [
+        ('width', ctypes.c_int),
+        ('height', ctypes.c_int),
+        ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int),
+        ('data', ctypes.c_void_p),
+        ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int),
+        ('bitmap_bit_order', ctypes.c_int),
+        ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int),
+        ('bytes_per_line', ctypes.c_int),
+        ('bits_per_pixel', ctypes.c_int),
+    ]
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong),
+        ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p),
+        ('readOnly', ctypes.c_int),
+    ]
+
+
+def _load_library(name):
+    path = ctypes.util.find_library(name)
+    if path is None:
+        raise FailExit('X11ShmFrameSource: library {!r} is not found'.format(name))
+    return ctypes.CDLL(path)
+
+
+class X11ShmFrameSource(FrameSource):
+
+    def __init__(self, display=None):
+        self._xlib = _load_library('X11')
+        self._xext = _load_library('Xext')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._declare_functions()
+
+        self._display = self._xlib.XOpenDisplay(display.encode() if display else None)
+        if not self._display:
+            raise FailExit('X11ShmFrameSource: can not open display {!r}'.format(display))
+        if not self._xext.XShmQueryExtension(self._display):
+            self._xlib.XCloseDisplay(self._display)
+            raise FailExit('X11ShmFrameSource: MIT-SHM extension is not available')
+
+        screen = self._xlib.XDefaultScreen(self._display)
+        self._root = self._xlib.XDefaultRootWindow(self._display)
+        self._visual = self._xlib.XDefaultVisual(self._display, screen)
+        self._depth = self._xlib.XDefaultDepth(self._display, screen)
+        self._root_w = self._xlib.XDisplayWidth(self._display, screen)
+        self._root_h = self._xlib.XDisplayHeight(self._display, screen)
+
+        self._shminfo = None
+        self._shm_size = 0
+        self._images = OrderedDict()  # (w, h) -> XImage pointer over the shared segment, the latest used last
+
+    def _declare_functions(self):
+        xlib, xext, libc = self._xlib, self._xext, self._libc
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultVisual.restype = ctypes.c_void_p
+        xlib.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDestroyImage.argtypes = [ctypes.POINTER(XImage)]
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmCreateImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p,
+            ctypes.POINTER(XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage), ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+    def _destroy_image(self, img):
+        img.contents.data = None  # The data belongs to the segment; XDestroyImage must not free it.
+        self._xlib.XDestroyImage(img)
+
+    def _release_segment(self):
+        for img in self._images.values():
+            self._destroy_image(img)
+        self._images = OrderedDict()
+        if self._shminfo is not None:
+            self._xext.XShmDetach(self._display, ctypes.byref(self._shminfo))
+            self._xlib.XSync(self._display, 0)
+            self._libc.shmdt(ctypes.c_void_p(self._shminfo.shmaddr))
+            self._shminfo = None
+            self._shm_size = 0
+
+    def _ensure_segment(self, size):
+        if self._shminfo is not None and size <= self._shm_size:
+            return
+        self._release_segment()
+        # Grow with the full root window size in mind to avoid reallocations on small growth.
+        size = max(size, self._root_w * self._root_h * 4)
+        shmid = self._libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if shmid < 0:
+            raise FailExit('X11ShmFrameSource: shmget() failed, errno {}'.format(ctypes.get_errno()))
+        addr = self._libc.shmat(shmid, None, 0)
+        if addr in (None, ctypes.c_void_p(-1).value):
+            self._libc.shmctl(shmid, IPC_RMID, None)
+            raise FailExit('X11ShmFrameSource: shmat() failed, errno {}'.format(ctypes.get_errno()))
+        shminfo = XShmSegmentInfo(0, shmid, addr, 0)
+        self._xext.XShmAttach(self._display, ctypes.byref(shminfo))
+        self._xlib.XSync(self._display, 0)
+        # Marked for removal right away: the segment disappears once both sides detach it.
+        self._libc.shmctl(shmid, IPC_RMID, None)
+        self._shminfo = shminfo
+        self._shm_size = size
+
+    def _get_image(self, w, h):
+        img = self._images.get((w, h))
+        if img is not None:
+            self._images.move_to_end((w, h))
+        else:
+            self._ensure_segment(w * h * 4)
+            img = self._xext.XShmCreateImage(
+                self._display, self._visual, self._depth, ZPixmap, None, ctypes.byref(self._shminfo), w, h)
+            if not img:
+                raise FailExit('X11ShmFrameSource: XShmCreateImage() failed')
+            if img.contents.bits_per_pixel != 32 or img.contents.bytes_per_line * h > self._shm_size:
+                self._xlib.XDestroyImage(img)
+                raise FailExit('X11ShmFrameSource: unsupported pixel format of depth {}'.format(self._depth))
+            img.contents.data = self._shminfo.shmaddr
+            self._images[(w, h)] = img
+            if len(self._images) > _MAX_IMAGES:
+                self._destroy_image(self._images.popitem(last=False)[1])
+        return img
+
+    def grab(self, x, y, w, h, out=None):
+        # XShmGetImage() fails with BadMatch outside of the root window, so clip beforehand:
+        x0, y0 = max(0, x), max(0, y)
+        w = min(x + w, self._root_w) - x0
+        h = min(y + h, self._root_h) - y0
+        if w <= 0 or h <= 0:
+            raise FailExit('X11ShmFrameSource: rectangle {} is out of the screen'.format((x, y, w, h)))
+
+        img = self._get_image(w, h)
+        if not self._xext.XShmGetImage(self._display, self._root, img, x0, y0, AllPlanes):
+            raise FailExit('X11ShmFrameSource: XShmGetImage() failed')
+
+        bytes_per_line = img.contents.bytes_per_line
+        buf = (ctypes.c_uint8 * (bytes_per_line * h)).from_address(self._shminfo.shmaddr)
+        bgra = np.frombuffer(buf, np.uint8).reshape(h, bytes_per_line)[:, :w * 4].reshape(h, w, 4)
+        return self._output(bgra[:, :, :3], out)
+
+    def get_desktop_rect(self):
+        return (0, 0, self._root_w, self._root_h)
+
+    def close(self):
+        if self._display:
+            self._release_segment()
+            self._xlib.XCloseDisplay(self._display)
+            self._display = None
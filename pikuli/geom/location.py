@@ -10,7 +10,8 @@ from contextlib import contextmanager
 
 from pikuli.input import InputEmulator, KeyModifier, Key, ScrollDirection, ButtonCode
 from pikuli._exceptions import PostMoveCheck
-from pikuli._functions import FailExit, _take_screenshot
+from pikuli._functions import FailExit
+from pikuli.capture import probe_pixels
 
 from .vector import Vector, RelativeVec
 
@@ -106,8 +107,7 @@ class LocationF(Vector):
         return int(round(self._y))
 
     def get_color(self):
-        arr = _take_screenshot(self._x_int, self._y_int, 1, 1)
-        return Color(*arr.reshape(3)[::-1])
+        return Color(*probe_pixels([(self._x_int, self._y_int)])[0].tolist())
 
     def mouse_move(self, delay=0):
         """
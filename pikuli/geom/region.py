@@ -6,6 +6,7 @@
    Контент может быть определен с поомощью методов Region.find() или Region.findAll(), которым передается объект класса Pattern (прямоугольная пиксельная область).
    Эти методы возвращают объект класса Match (потомок Region), имеющим те же свойства и методы, что и Region. Размеры Match равны размерам Pattern, используемого для поиска.
 '''
+import functools
 import time
 import traceback
 import datetime
@@ -24,6 +25,9 @@ from pikuli import Settings, FindFailed, FailExit, File
 
 from pikuli._functions import _take_screenshot, verify_timeout_argument, highlight_region
 from pikuli.Pattern import Pattern
+from pikuli import matching
+from pikuli.capture import CaptureService, FrameSources
+from pikuli.poll_scheduler import PollScheduler
 
 from .vector import RelativeVec
 from .location import Location
@@ -44,6 +48,8 @@ def _get_list_of_patterns(ps, failExitText):
     if not isinstance(ps, list):
         ps = [ps]
     for i, p in enumerate(ps):
+        if isinstance(p, Pattern):
+            continue
         try:
             ps[i] = Pattern(p)
         except Exception as ex:
@@ -131,6 +137,8 @@ class Region(object):
             find_timeout      --  Значение по умолчанию, которове будет использоваться, если метод find() (и подобные) этого класса вызван без явного указания timeout.
                                   Если не передается конструктуру, то берется из переменной модуля DEFAULT_FIND_TIMEOUT.
                                   Будет наслодоваться ко всем объектам, которые возвращаются методами этого класса.
+            frame_source      --  Откуда брать скриншоты области: имя зарегистрированного источника кадров или экземпляр
+                                  pikuli.capture.FrameSource. None (по умолчанию) -- источник, выбранный для текущего потока.
 
         Дополнительная справка:
             Внутренние поля класса:
@@ -163,6 +171,7 @@ class Region(object):
                 self._title = repr(kwargs['title'])
         self._id           = kwargs.get('id', None)  # Идентификатор для использования в коде.
         self._winctrl      = kwargs.get('winctrl', None)
+        self._frame_source = kwargs.get('frame_source', None)
 
         # # Здесь будет храниться экземпляр класса winforms, если Region найдем с помощью win32api:
         # self.winctrl = winforms.HWNDElement()
@@ -233,7 +242,7 @@ class Region(object):
 
     def setRect(self, *args, **kwargs):
         try:
-            if len(args) == 1 and (isinstance(args[0], Region) or isinstance(args[0], Screen)):
+            if len(args) == 1 and isinstance(args[0], Region):  # Screen -- тоже Region
                 self.__set_from_Region(args[0])
 
             elif len(args) == 4:
@@ -276,6 +285,8 @@ class Region(object):
         self._w = reg.w
         self._h = reg.h
         self._find_timeout = reg._find_timeout
+        if self._frame_source is None:
+            self._frame_source = reg._frame_source
 
     @property
     def x(self):
@@ -312,12 +323,16 @@ class Region(object):
         else:
             raise FailExit('[error] Incorect \'offset()\' method call:\n\targs = %s' % str(args))
 
+    def __desktop_rect(self):
+        ''' (x, y, w, h) рабочего стола источника кадров этой области (для mss -- из кэша pikuli.capture.MonitorTopology). '''
+        return FrameSources.resolve(self._frame_source).get_desktop_rect()
+
     def right(self, l=None):
         ''' Возвращает область справа от self. Self не включено. Высота новой области совпадает с self. Длина новой области len или до конца экрана, если len не задана. '''
         try:
             if l is None:
-                scr = Screen('virt')
-                reg = Region(self._x + self._w, self._y, (scr.x + scr.w - 1) - (self._x + self._w) + 1, self._h, find_timeout=self._find_timeout)
+                (sx, sy, sw, sh) = self.__desktop_rect()
+                reg = Region(self._x + self._w, self._y, (sx + sw - 1) - (self._x + self._w) + 1, self._h, find_timeout=self._find_timeout)
             elif isinstance(l, int) and l > 0:
                 reg = Region(self._x + self._w, self._y, l, self._h, find_timeout=self._find_timeout)
             # elif isinstance(l, Region):  --  TODO: до пересечения с ... Если внутри или снаружи.
@@ -331,8 +346,8 @@ class Region(object):
         ''' Возвращает область слева от self. Self не включено. Высота новой области совпадает с self. Длина новой области len или до конца экрана, если len не задана. '''
         try:
             if l is None:
-                scr = Screen('virt')
-                reg = Region(scr.x, self._y, (self._x - 1) - scr.x + 1, self._h, find_timeout=self._find_timeout)
+                (sx, sy, sw, sh) = self.__desktop_rect()
+                reg = Region(sx, self._y, (self._x - 1) - sx + 1, self._h, find_timeout=self._find_timeout)
             elif isinstance(l, int) and l > 0:
                 reg = Region(self._x - l, self._y, l, self._h, find_timeout=self._find_timeout)
             # elif isinstance(l, Region):  --  TODO: до пересечения с ... Если внутри или снаружи.
@@ -346,8 +361,8 @@ class Region(object):
         ''' Возвращает область сверху от self. Self не включено. Ширина новой области совпадает с self. Высота новой области len или до конца экрана, если len не задана. '''
         try:
             if l is None:
-                scr = Screen('virt')
-                reg = Region(self._x, scr.y, self._w, (self._y - 1) - scr.y + 1, find_timeout=self._find_timeout)
+                (sx, sy, sw, sh) = self.__desktop_rect()
+                reg = Region(self._x, sy, self._w, (self._y - 1) - sy + 1, find_timeout=self._find_timeout)
             elif isinstance(l, int) and l > 0:
                 reg = Region(self._x, self._y - l, self._w, l, find_timeout=self._find_timeout)
             # elif isinstance(l, Region):  --  TODO: до пересечения с ... Если внутри или снаружи.
@@ -361,8 +376,8 @@ class Region(object):
         ''' Возвращает область снизу от self. Self не включено. Ширина новой области совпадает с self. Высота новой области len или до конца экрана, если len не задана. '''
         try:
             if l is None:
-                scr = Screen('virt')
-                reg = Region(self._x, self._y + self._h, self._w, (scr.y + scr.h - 1) - (self._y + self._h) + 1, find_timeout=self._find_timeout)
+                (sx, sy, sw, sh) = self.__desktop_rect()
+                reg = Region(self._x, self._y + self._h, self._w, (sy + sh - 1) - (self._y + self._h) + 1, find_timeout=self._find_timeout)
             elif isinstance(l, int) and l > 0:
                 reg = Region(self._x, self._y + self._h, self._w, l, find_timeout=self._find_timeout)
             # elif isinstance(l, Region):  --  TODO: до пересечения с ... Если внутри или снаружи.
@@ -418,21 +433,69 @@ class Region(object):
     def wh(self):
         return (self.w, self.h)
 
-    def __get_field_for_find(self):
-        return self.get_raw_screenshot()
+    def __capture_service(self):
+        ''' Запущенный CaptureService, если кадры для этой области берутся из него, иначе None. Сервис подходит,
+        только если снимает тот же источник кадров, что выбран для области (или для текущего потока). '''
+        service = CaptureService.get_active()
+        source = self._frame_source if self._frame_source is not None else FrameSources.get_selection()
+        if service is not None and service.captures(source) and service.contains(*self.geometry):
+            return service
+        return None
+
+    def __grab_field(self, newer_than=None, scheduler=None, reuse_buffer=False):
+        '''
+        Возвращает (field, timestamp). Если запущен pikuli.capture.CaptureService и область целиком в его кадре, то
+        field -- это копия части самого свежего кадра сервиса; при заданном newer_than ждем кадр, снятый
+        позже этого момента (шкала time.monotonic()), но не дольше DELAY_BETWEEN_CV_ATTEMPT и не дольше, чем осталось
+        до срока scheduler (PollScheduler). Иначе делаем скриншот сами -- при reuse_buffer в буфер потока (см.
+        get_raw_screenshot()): так делают циклы ожидания, которые хранят только копии field.
+        '''
+        service = self.__capture_service()
+        if service is not None:
+            timeout = DELAY_BETWEEN_CV_ATTEMPT
+            if scheduler is not None and scheduler.remaining is not None:
+                timeout = min(timeout, scheduler.remaining)
+            res = service.crop(*self.geometry, newer_than=newer_than, timeout=timeout)
+            if res is None:
+                res = service.crop(*self.geometry)
+            return res
+        return self.get_raw_screenshot(reuse_buffer=reuse_buffer), time.monotonic()
+
+    def __get_field_for_find(self, reuse_buffer=False):
+        return self.__grab_field(reuse_buffer=reuse_buffer)[0]
+
+    @staticmethod
+    def _owned_image(img):
+        ''' Read-only картинки -- общие буферы, которые будут перезаписаны: то, что храним, копируем. '''
+        return img if img.flags.writeable else img.copy()
 
     def get_current_image(self):
         ''' Возвращает текущий скриншот региона в виде картинки. В душе -- это np.array. '''
-        return self.__get_field_for_find()
+        return self._owned_image(self.__get_field_for_find())
 
     def is_image_equal_to(self, img):
         ''' Проверяет, что текущее изображение на экране в области (x,y,w,h) совпадет с
         картинкой img в формате np.array, передаваеймо в функцию как рагумент. '''
-        return np.array_equal(self.__get_field_for_find(), img)
+        return np.array_equal(self.get_raw_screenshot(reuse_buffer=True), img)
+
+    def store_current_image(self, digest=None):
+        '''
+        Сохраняет в поле класса картинку с экрана из области (x,y,w,h). Формат -- numpu.array.
+            digest  --  хранить вместо картинки только хэши ее плиток (pikuli.matching.ImageDigest). None -- берется
+                        Settings.StoreImageDigest.
+        '''
+        self._store_image(self.__get_field_for_find(), digest)
+
+    def _store_image(self, img, digest=None):
+        if digest is None:
+            digest = pikuli.Settings.StoreImageDigest
+        self._image_at_some_moment = matching.ImageDigest(img) if digest else self._owned_image(img)
 
-    def store_current_image(self):
-        ''' Сохраняет в поле класса картинку с экрана из области (x,y,w,h). Формат -- numpu.array. '''
-        self._image_at_some_moment = self.__get_field_for_find()
+    def get_stored_image(self):
+        ''' Сохраненная картинка; если хранится ImageDigest -- его уменьшенная копия (или None, если ее нет). '''
+        if isinstance(self._image_at_some_moment, matching.ImageDigest):
+            return self._image_at_some_moment.thumbnail
+        return self._image_at_some_moment
 
     def clear_sored_image(self):
         ''' Очищает сохраненную в классе картинку. '''
@@ -441,14 +504,40 @@ class Region(object):
     def is_image_changed(self, rewrite_stored_image=False):
         ''' Изменилась ли картинка на экране в регионе с момента последнего вызова этой фукнции
         или self.store_current_image()? Отвечаем на этот вопрос путем сравнения сохраненной в классе
-        картинки с тем, что сейчас изоюражено на экране.
+        картинки (или ее хэшей) с тем, что сейчас изоюражено на экране.
         В зависости от аргумента rewrite_stored_image обновим или нет картинку, сохраненную в классе. '''
-        img = self.__get_field_for_find()
-        eq  = (self._image_at_some_moment is not None) and np.array_equal(img, self._image_at_some_moment)
+        img = self.__get_field_for_find(reuse_buffer=True)
+        stored = self._image_at_some_moment
+        if stored is None:
+            eq = False
+        elif isinstance(stored, matching.ImageDigest):
+            eq = stored.is_equal_to(img)
+        else:
+            eq = np.array_equal(img, stored)
         if rewrite_stored_image:
-            self._image_at_some_moment = img
+            self._store_image(img, isinstance(stored, matching.ImageDigest) if stored is not None else None)
         return (not eq)
 
+    def get_changed_rects(self, rewrite_stored_image=False):
+        '''
+        Где изменилась картинка в регионе с момента store_current_image()? Возвращает список Region -- прямоугольников
+        из плиток, хэши которых поменялись (пустой, если ничего не изменилось; весь регион, если нечего сравнивать).
+        Второй раз картинки попиксельно не сравниваются.
+        '''
+        img = self.__get_field_for_find(reuse_buffer=True)
+        stored = self._image_at_some_moment
+        if stored is None:
+            rects = None
+        elif isinstance(stored, matching.ImageDigest):
+            rects = stored.changed_rects(img)
+        else:
+            rects = matching.ImageDigest(stored, thumbnail_scale=0).changed_rects(img)
+        if rewrite_stored_image:
+            self._store_image(img, isinstance(stored, matching.ImageDigest) if stored is not None else None)
+        if rects is None:
+            rects = [(0, 0, self._w, self._h)]
+        return [Region(self._x + x, self._y + y, w, h, frame_source=self._frame_source) for (x, y, w, h) in rects]
+
     def _save_as_prep(self, full_filename, format_, msg, msg_loglevel):
         if format_ not in ['jpg', 'png']:
             logger.error('[INTERNAL] Unsupported format_={!r} at call of '
@@ -503,27 +592,64 @@ class Region(object):
     def geometry(self):
         return self._x, self._y, self._w, self._h
 
-    def get_raw_screenshot(self):
-        """Returns Region screenshot as a 2D numpy array of int8
-        """
-        return _take_screenshot(*(self.geometry + (self._main_window_hwnd,)))
+    def get_raw_screenshot(self, reuse_buffer=False):
+        """Returns Region screenshot as a BGR numpy array of uint8 with shape (h, w, 3).
 
-    def __find(self, ps, field):
+        :param reuse_buffer: Write into the per-thread buffer of the frame source (see
+                             :func:`pikuli._functions._take_screenshot`). The result is valid
+                             until the next such call only.
+        """
+        return _take_screenshot(*(self.geometry + (self._main_window_hwnd,)),
+                                reuse_buffer=reuse_buffer, source=self._frame_source)
+
+    def get_frame_source(self):
+        return self._frame_source
+
+    def set_frame_source(self, source):
+        ''' Имя зарегистрированного источника кадров, экземпляр pikuli.capture.FrameSource или None. '''
+        self._frame_source = source
+
+    def __search(self, ps, field, nms=None, overlap=None, incremental=None, locality=False, best=None, screen=None):
+        ''' Возвращает (p, xs, ys, scores): копию шаблона p, размер которой -- размер найденных вхождений (см.
+        Pattern.scaled()), и numpy-массивы координат в field и score вхождений.
+        best -- если задано число k, то нужны только k лучших вхождений (по убыванию score, см.
+        pikuli.matching.best): все попадания выше порога при этом не перечисляются, а nms не нужен.
+        screen -- ключ экрана для шаблонов с несколькими масштабами (см. __screen_key()); None -- вычислить здесь.
+        В рабочих потоках (__find_many()) его вычислять нельзя: источник кадров выбирается для каждого потока. '''
         # cv2.imshow('field', field)
         # cv2.imshow('pattern', ps._cv2_pattern)
         # cv2.waitKey(3*1000)
         # cv2.destroyAllWindows()
 
-        CF = 0
         try:
-            if CF == 0:
-                res = cv2.matchTemplate(field, ps._cv2_pattern, cv2.TM_CCORR_NORMED)
-                loc = np.where(res > ps.getSimilarity())  # 0.995
-            elif CF == 1:
+            if ps.get_method() == 'ccorr_normed':
+                # TM_CCORR_NORMED в режиме, который задан в Pattern или Settings.SearchMode. При повторных
+                # попытках (incremental) пересчитывается только то, что изменилось с прошлой попытки. У шаблона
+                # с несколькими масштабами найденное вхождение имеет размер той копии шаблона, что нашлась:
+                if screen is None and ps.get_scales():
+                    screen = self.__screen_key()
+                if best is None:
+                    (search, full_search) = (matching.search, (incremental or matching).search)
+                else:
+                    search = functools.partial(matching.search_best, k=best, overlap=overlap)
+                    full_search = functools.partial((incremental or matching).search_best, k=best, overlap=overlap)
+                # Сначала (locality) ищем рядом с тем местом, где шаблон нашелся в прошлый раз, и в ROI из профиля:
+                near = self.__find_near_hints(ps, field, screen, search) if locality else None
+                if near is not None:
+                    (p, xs, ys, scores) = near
+                    if incremental is not None:
+                        incremental.forget(ps)  # Его карты корреляции не видели этот field.
+                else:
+                    (p, xs, ys, scores) = matching.multiscale_search(field, ps, screen, search=full_search)
+            else:
+                # 'sqdiff_normed' из профиля шаблона. Score приводим к виду "больше -- лучше", как у TM_CCORR_NORMED:
                 res = cv2.matchTemplate(field, ps._cv2_pattern, cv2.TM_SQDIFF_NORMED)
                 loc = np.where(res < 1.0 - ps.getSimilarity())  # 0.005
+                (p, xs, ys, scores) = (ps, loc[1], loc[0], 1.0 - res[loc])
+                if best is not None:
+                    (xs, ys, scores) = matching.top_hits(xs, ys, scores, best, ps.getW(), ps.getH(), overlap)
         except cv2.error as ex:
-            raise FindFailed('OpenCV ERROR: ' + str(ex), patterns=ps, field=field, cause=FindFailed.OPENCV_ERROR)
+            raise FindFailed('OpenCV ERROR: ' + str(ex), patterns=ps, field=self._owned_image(field), cause=FindFailed.OPENCV_ERROR)
 
         # for pt in zip(*loc[::-1]):
         #    cv2.rectangle(field, pt, (pt[0] + self._w, pt[1] + self._h), (0, 0, 255), 2)
@@ -547,12 +673,172 @@ class Region(object):
         #cv2.imwrite('c:\\tmp\\%i-%06i-field.png' % (int(t), (t-int(t))*10**6), field)
         #cv2.imwrite('c:\\tmp\\%i-%06i-pattern.png' % (int(t), (t-int(t))*10**6), ps._cv2_pattern)
 
-        return map(lambda x, y, s: (int(x) + self._x, int(y) + self._y, float(s)), loc[1], loc[0], res[loc[0], loc[1]])
-
-
-    def findAll(self, ps, delay_before=0):
+        # Сводим "облака" соседних попаданий к отдельным вхождениям шаблона (см. pikuli.matching.nms):
+        if best is None:
+            (xs, ys, scores) = matching.reduce_hits(xs, ys, scores, p.getW(), p.getH(), nms, overlap)
+        if len(xs) != 0:
+            i_best = int(np.argmax(scores))
+            matching.last_seen_index.remember(ps, self, (xs[i_best] + self._x, ys[i_best] + self._y, p.getW(), p.getH()))
+
+        return p, xs, ys, scores
+
+    def __find(self, ps, field, nms=None, overlap=None, incremental=None, locality=False, best=None, screen=None):
+        ''' Список вхождений ps в field: (x, y, score, w, h) в координатах экрана. '''
+        (p, xs, ys, scores) = self.__search(ps, field, nms, overlap, incremental, locality, best, screen)
+        return [(int(x) + self._x, int(y) + self._y, float(s), p.getW(), p.getH()) for (x, y, s) in zip(xs, ys, scores)]
+
+    def __find_near_hints(self, ps, field, screen, search):
+        ''' Поиск сначала в окне Settings.LocalityMargin пикселей вокруг последнего вхождения ps в эту область (см.
+        pikuli.matching.locality), потом в ROI из профиля шаблона (Pattern.get_roi()). Возвращает то же, что
+        multiscale_search(), в координатах field или None, если там не нашлось. '''
+        rect = matching.last_seen_index.get(ps, self)
+        if rect is not None:
+            margin = pikuli.Settings.LocalityMargin
+            found = self.__find_in_rect(ps, field, screen, search,
+                                        (rect[0] - margin, rect[1] - margin, rect[2] + 2 * margin, rect[3] + 2 * margin))
+            matching.last_seen_index.count(found is not None)
+            if found is not None:
+                return found
+        roi = ps.get_roi()
+        if roi is not None:
+            return self.__find_in_rect(ps, field, screen, search, roi)
+        return None
+
+    def __find_in_rect(self, ps, field, screen, search, rect):
+        ''' Поиск в части field, которая попадает в прямоугольник rect (координаты экрана). '''
+        x0, y0 = max(0, rect[0] - self._x), max(0, rect[1] - self._y)
+        x1 = min(field.shape[1], rect[0] - self._x + rect[2])
+        y1 = min(field.shape[0], rect[1] - self._y + rect[3])
+        if x0 >= x1 or y0 >= y1 or (x1 - x0, y1 - y0) == (field.shape[1], field.shape[0]):
+            return None
+        # В части меньше шаблона (самой маленькой из его копий, если масштабов несколько) искать нечего:
+        scales = ps.get_scales() or (1.0,)
+        min_w = min(max(1, int(round(ps.getW() * s))) for s in scales)
+        min_h = min(max(1, int(round(ps.getH() * s))) for s in scales)
+        if x1 - x0 < min_w or y1 - y0 < min_h:
+            return None
+        (p, xs, ys, scores) = matching.multiscale_search(field[y0:y1, x0:x1], ps, screen, search=search)
+        if len(xs) == 0:
+            return None
+        return p, xs + x0, ys + y0, scores
+
+    def __screen_key(self):
+        '''
+        Ключ экрана, на котором область, для запоминания масштаба шаблонов (см. pikuli.matching.multiscale): монитор,
+        на котором центр области (у мониторов может быть разный масштаб), или весь рабочий стол.
+        '''
+        source = FrameSources.resolve(self._frame_source)
+        (cx, cy) = (self._x + self._w // 2, self._y + self._h // 2)
+        for rect in source.get_monitor_rects():
+            if rect[0] <= cx < rect[0] + rect[2] and rect[1] <= cy < rect[1] + rect[3]:
+                return (type(source).__name__, tuple(rect))
+        return (type(source).__name__, tuple(source.get_desktop_rect()))
+
+
+    def __make_match(self, pt, p, field):
+        ''' Match из результата __find() -- (x, y, score, w, h). Картинкой Match'а становится копия среза field -- без
+        нового скриншота. Именно копия: view держал бы в памяти весь field. '''
+        (x, y, score, w, h) = pt
+        frame = field[y - self._y:y - self._y + h, x - self._x:x - self._x + w].copy()
+        return pikuli.Match(x, y, w, h, p, score, frame=frame, frame_source=self._frame_source)
+
+    def __find_many(self, ps, field, nms=None, overlap=None, incremental=None, locality=False, best=None):
+        ''' Ищет все шаблоны из списка ps в одном и том же field (параллельно, см. pikuli.matching.batch).
+        Возвращает список результатов __find() в порядке ps. '''
+        # Ключ экрана -- здесь, в вызывающем потоке: он зависит от источника кадров, выбранного для этого потока.
+        screen = self.__screen_key() if any(p.get_scales() for p in ps) else None
+        with matching.shared_field(field, len(ps)):
+            return matching.map_patterns(
+                lambda p: self.__find(p, field, nms, overlap, incremental, locality, best, screen), ps)
+
+    def find_best(self, ps, k=1, overlap=None):
+        '''
+        Ищет не больше k лучших (по score) вхождений шаблонов из ps в одном скриншоте, без ожидания. Все
+        попадания выше порога не перечисляются (см. pikuli.matching.best), поэтому это дешевле findAll(). Вхождения,
+        которые ближе overlap (как в findAll()) к лучшему, не выдаются. Возвращает список Match'ей по убыванию score
+        (пустой, если ничего не нашлось).
+        '''
+        ps = _get_list_of_patterns(ps, 'bad \'ps\' argument; it should be a string (path to image file) or \'Pattern\' object: %s' % str(ps))
+        if k < 1:
+            raise FailExit('bad argument: k = {!r}'.format(k))
+        field = self.__get_field_for_find()
+        matches = []
+        for p, pts in zip(ps, self.__find_many(ps, field, overlap=overlap, best=k)):
+            matches.extend(self.__make_match(pt, p, field) for pt in pts)
+        matches.sort(key=lambda m: -m.getScore())
+        return matches[:k]
+
+    def iter_find_all(self, ps, max_matches=None, min_score=None, order='score', nms=None, overlap=None):
+        '''
+        Как findAll(), но генератор: Match'и создаются по одному, когда их забирают, и не больше max_matches.
+        Скриншот делается один раз при первом обращении; найденные вхождения до выдачи хранятся только как
+        numpy-массивы. Если ничего не найдено, то генератор пуст, исключения FindFailed не возникает.
+
+        max_matches  --  сколько Match'ей выдать самое большее. None -- все.
+        min_score    --  выдавать только вхождения со score не меньше этого (вдобавок к similarity шаблонов).
+        order        --  'score' -- по убыванию score среди всех шаблонов из ps;
+                         'scan'  -- шаблоны по очереди, вхождения каждого построчно (шаблон ищется, только когда
+                                    до него дошла очередь).
+        nms, overlap --  как в findAll().
+        '''
+        ps = _get_list_of_patterns(ps, 'bad \'ps\' argument; it should be a string (path to image file) or \'Pattern\' object: %s' % str(ps))
+        if order not in ('score', 'scan'):
+            raise FailExit('bad argument: order = {!r}; it should be \'score\' or \'scan\''.format(order))
+        if max_matches is not None and max_matches <= 0:
+            return
+
+        # Генератор может простаивать между выдачами -- кадр CaptureService за это время перезапишется:
+        field = self._owned_image(self.__get_field_for_find())
+
+        def hits(p):
+            (p_found, xs, ys, scores) = self.__search(p, field, nms, overlap)
+            if min_score is not None:
+                keep = scores >= min_score
+                (xs, ys, scores) = (xs[keep], ys[keep], scores[keep])
+            return p_found, xs, ys, scores
+
+        def make_match(p, p_found, x, y, score):
+            return self.__make_match((int(x) + self._x, int(y) + self._y, float(score), p_found.getW(), p_found.getH()), p, field)
+
+        n_yielded = 0
+        if order == 'scan':
+            for p in ps:
+                (p_found, xs, ys, scores) = hits(p)
+                for i in range(len(xs)):
+                    yield make_match(p, p_found, xs[i], ys[i], scores[i])
+                    n_yielded += 1
+                    if n_yielded == max_matches:
+                        return
+        else:
+            with matching.shared_field(field, len(ps)):
+                found = matching.map_patterns(hits, ps)
+            scores = np.concatenate([f[3] for f in found]) if found else np.empty(0, np.float32)
+            owners = np.repeat(np.arange(len(found)), [len(f[3]) for f in found])
+            offsets = np.cumsum([0] + [len(f[3]) for f in found])
+            if max_matches is not None and max_matches < len(scores):
+                # Нужны только max_matches лучших -- полностью сортировать не надо:
+                order_idx = np.argpartition(-scores, max_matches - 1)[:max_matches]
+                order_idx = order_idx[np.argsort(-scores[order_idx], kind='stable')]
+            else:
+                order_idx = np.argsort(-scores, kind='stable')
+            for i in order_idx:
+                k = owners[i]
+                (p_found, xs, ys, _) = found[k]
+                j = i - offsets[k]
+                yield make_match(ps[k], p_found, xs[j], ys[j], scores[i])
+
+    def findAll(self, ps, delay_before=0, group_by_pattern=False, nms=None, overlap=None):
         '''
         Если ничего не найдено, то вернется пустой list, и исключения FindFailed не возникнет.
+
+        Скриншот делается один раз, все шаблоны из ps ищутся в нем параллельно.
+        group_by_pattern  --  если True, то возвращается список списков Match'ей: по одному списку на каждый шаблон
+                              из ps (в том же порядке). Иначе -- общий список.
+        nms               --  None (каждый пиксель выше порога -- отдельный Match) или способ свести соседние попадания
+                              к одному вхождению шаблона (см. pikuli.matching.nms):
+                                'peaks'   - оставить попадания с максимальным score в своей окрестности;
+                                'cluster' - заменить группу попаданий средним (с весами score) положением.
+        overlap           --  попадания соседние, если |dx| < overlap * w и |dy| < overlap * h. None -- Settings.NmsOverlap.
         '''
         err_msg_template = '[error] Incorect \'findAll()\' method call:\n\tps = %s\n\ttypeOf ps=%s\n\tdelay_before = %s\n\tadditional comment: %%s' % (str(ps),type(ps), str(delay_before))
 
@@ -564,11 +850,12 @@ class Region(object):
         ps = _get_list_of_patterns(ps, err_msg_template % 'bad \'ps\' argument; it should be a string (path to image file) or \'Pattern\' object')
 
         time.sleep(delay_before)
-        (pts, self._last_match) = ([], [])
+        (grouped, self._last_match) = ([], [])
         try:
-            for p in ps:
-                pts.extend( self.__find(p, self.__get_field_for_find()) )
-                self._last_match.extend( map(lambda pt: Match(pt[0], pt[1], p._w, p._h, p, pt[2]), pts) )
+            field = self.__get_field_for_find()
+            for p, pts in zip(ps, self.__find_many(ps, field, nms, overlap)):
+                grouped.append([self.__make_match(pt, p, field) for pt in pts])
+                self._last_match.extend(grouped[-1])
 
         except FindFailed as ex:
             dt = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
@@ -591,6 +878,8 @@ class Region(object):
             scores = '[' + ', '.join(['%.2f'%m.getScore() for m in self._last_match]) + ']'
             logger.info('pikuli.findAll: total found {} matches of <{}> in {}; scores = {}'.format(
                 len(self._last_match), str(ps), str(self), scores))
+            if group_by_pattern:
+                return grouped
             return self._last_match
 
 
@@ -619,20 +908,25 @@ class Region(object):
             except ValueError:
                 raise FailExit('bad argument: timeout = \'%s\'' % str(timeout))
 
-        prev_field = None
-        elaps_time = 0
+        incremental = matching.IncrementalSearch()
+        field_time = None
+        # Паузы между попытками растут от Settings.PollMinDelay до Settings.PollMaxDelay; с CaptureService пауза
+        # прерывается, как только в кадре что-то изменилось:
+        scheduler = PollScheduler(timeout, wake_source=self.__capture_service())
         while True:
-            field = self.__get_field_for_find()
+            # С CaptureService каждая попытка берет кадр новее предыдущего:
+            (field, field_time) = self.__grab_field(newer_than=field_time, scheduler=scheduler, reuse_buffer=True)
 
-            if prev_field is None or (prev_field != field).all():
-                for _ps_ in ps:
-                    pts = self.__find(_ps_, field)
+            # Если по хэшам плиток в области ничего не изменилось, то и результат поиска прежний -- не ищем:
+            if incremental.update(field):
+                # Все шаблоны ищутся в одном скриншоте параллельно, а результаты разбираются в порядке ps:
+                for _ps_, pts in zip(ps, self.__find_many(ps, field, incremental=incremental, locality=True, best=1)):
                     if aov == 'appear':
                         if len(pts) != 0:
-                            # Что-то нашли. Выберем один вариант с лучшим 'score'. Из несольких с одинаковыми 'score' будет первый при построчном проходе по экрану.
-                            pt = max(pts, key=lambda pt: pt[2])
+                            # Что-то нашли. Ищется только вариант с лучшим 'score' (best=1). Из несольких с одинаковыми 'score' будет первый при построчном проходе по экрану.
+                            pt = pts[0]
                             logger.info( 'pikuli.%s.<find...>: %s has been found' % (type(self).__name__, _ps_.getFilename(full_path=False)))
-                            return Match(pt[0], pt[1], _ps_._w, _ps_._h, _ps_, pt[2])
+                            return self.__make_match(pt, _ps_, field)
                     elif aov == 'vanish':
                         if len(pts) == 0:
                             logger.info( 'pikuli.%s.<find...>: %s has vanished' % (type(self).__name__, _ps_.getFilename(full_path=False)))
@@ -640,9 +934,7 @@ class Region(object):
                     else:
                         raise FailExit('unknown \'aov\' = \'%s\'' % str(aov))
 
-            time.sleep(DELAY_BETWEEN_CV_ATTEMPT)
-            elaps_time += DELAY_BETWEEN_CV_ATTEMPT
-            if elaps_time >= timeout:
+            if not scheduler.sleep(since=field_time):
                 logger.info( 'pikuli.%s.<find...>: %s hasn\'t been found' % (type(self).__name__, _ps_.getFilename(full_path=False)) +
                      ', but exception was disabled.' if exception_on_find_fail is not None and not exception_on_find_fail else '' )
                 #TODO: Какие-то ту ошибки. Да и следует передавать, наверно, картинки в FindFailed(), а где-то из модулей робота сохранять, если надо.
@@ -658,8 +950,8 @@ class Region(object):
 
                 failedImages = ', '.join(map(lambda p: p.getFilename(full_path=True), ps))
                 raise FindFailed(
-                    "Unable to find '{}' in {} after {} secs of trying".format(failedImages, self, elaps_time),
-                    patterns=ps, field=field
+                    "Unable to find '{}' in {} after {:.2f} secs of trying".format(failedImages, self, scheduler.elapsed),
+                    patterns=ps, field=self._owned_image(field)
                 )
 
 
@@ -762,6 +1054,57 @@ class Region(object):
                 return self._last_match
 
 
+    def wait_until_stable(self, quiet_ms=None, timeout=None, tolerance=None):
+        '''
+        Ждет, пока картинка в регионе не перестанет меняться (анимации, перерисовки) -- вместо sleep'ов "с запасом".
+            quiet_ms   --  сколько миллисекунд картинка не должна меняться. None -- Settings.StableQuietMs.
+            timeout    --  сколько секунд ждать. None -- значение по умолчанию, как у find().
+            tolerance  --  0: любое изменение пикселя (сравниваются хэши плиток); больше 0: изменение, если какой-то канал
+                           уменьшенной в Settings.StableThumbnailScale раз картинки изменился больше, чем на tolerance.
+                           None -- Settings.StableTolerance.
+        Кадры берутся так же, как при поиске: с запущенным CaptureService -- из его кадров.
+        Возвращает время успокоения в секундах (от вызова до последнего замеченного изменения; 0.0 -- регион и не
+        менялся) или None, если регион так и не успокоился за timeout.
+        '''
+        quiet = (pikuli.Settings.StableQuietMs if quiet_ms is None else quiet_ms) / 1000.0
+        timeout = self._find_timeout if timeout is None else verify_timeout_argument(
+            timeout, err_msg='[error] Incorect Region.wait_until_stable() method call')
+        tolerance = pikuli.Settings.StableTolerance if tolerance is None else tolerance
+        interval = pikuli.Settings.StablePollInterval
+
+        if tolerance > 0:
+            scale = float(pikuli.Settings.StableThumbnailScale)
+            size = (max(1, int(round(self._w / scale))), max(1, int(round(self._h / scale))))
+            prev = [None]
+
+            def changed(field):
+                thumb = cv2.resize(field, size, interpolation=cv2.INTER_AREA)
+                res = prev[0] is not None and int(cv2.absdiff(thumb, prev[0]).max()) > tolerance
+                prev[0] = thumb
+                return res
+        else:
+            tracker = matching.ChangeTracker()
+
+            def changed(field):
+                return tracker.update(field) not in (None, [])
+
+        scheduler = PollScheduler(timeout, min_delay=interval, max_delay=interval, wake_source=self.__capture_service())
+        start = time.monotonic()
+        (field, field_time) = self.__grab_field(reuse_buffer=True)
+        changed(field)
+        last_change = start
+        while True:
+            if field_time - last_change >= quiet:
+                settle = last_change - start
+                logger.info('pikuli.%s.wait_until_stable(): %s has settled in %.3f s' % (type(self).__name__, str(self), settle))
+                return settle
+            if not scheduler.sleep(since=field_time):
+                logger.info('pikuli.%s.wait_until_stable(): %s has not settled in %.2f s' % (type(self).__name__, str(self), scheduler.elapsed))
+                return None
+            (field, field_time) = self.__grab_field(newer_than=field_time, scheduler=scheduler, reuse_buffer=True)
+            if changed(field):
+                last_change = field_time
+
     def getLastMatch(self):
         ''' Возвращает результаты последнего поиска. '''
         if self._last_match is None or self._last_match == []:
@@ -905,40 +1248,5 @@ class Region(object):
         Если ничего не найдено, то возвращается пустой список.
         '''
 
-        if not isinstance(ps, list):
-            ps = [ps]
-
-        matches = []  # Список списков. В него будут помещаться
-        for p in ps:
-            unsorted_matches = self.findAll(p)  # Несгруппированные вхождения шаблона
-            grouped_matches = []
-            while len(unsorted_matches) > 0:
-                next_match = unsorted_matches.pop(0)
-
-                # Добавим next_match в существующую гурппу ...
-                logger.info(grouped_matches)
-                for g in grouped_matches:
-                    for m in g:
-                        if abs(m.x - next_match.x) < next_match.w and \
-                           abs(m.y - next_match.y) < next_match.h:
-                            g.append(next_match)
-                            next_match = None
-                            break
-                    if next_match is None:
-                        break
-
-                # ... или созданим для него новую группу.
-                if next_match is not None:
-                    grouped_matches.append([next_match])
-
-            matches.extend(grouped_matches)
-
-        # Замени группы совпадений на итоговые классы Match:
-        for i in range(len(matches)):
-            sum_score = sum( [m.getScore() for m in matches[i]] )
-            x = sum( [m.x*m.getScore() for m in matches[i]] ) / sum_score
-            y = sum( [m.y*m.getScore() for m in matches[i]] ) / sum_score
-            matches[i] = Match(x, y, matches[i][0].w, matches[i][0].h, matches[i][0].getPattern(), sum_score/len(matches[i]))
-
-        return matches
-
+        # Группировка -- это pikuli.matching.nms.cluster_hits() с критерием "прямоугольники пересекаются":
+        return self.findAll(ps, nms='cluster', overlap=1.0)
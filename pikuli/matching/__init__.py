@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+"""
+Search engines used by :class:`pikuli.Region` to look for :class:`pikuli.Pattern` in a field (a
+screenshot as numpy array). Each search mode is a function `(field, pattern) -> (xs, ys, scores)`.
+"""
+
+import pikuli
+from .plain import match_template, score_map, plain_search, hits_above, exact_scores
+from .stripes import striped_match_template, stripes_search
+from .fft import FieldSpectra, shared_field, fft_search
+from .prefilter import score_bound, prefiltered_score_map
+from .pyramid import pyramid_search, pattern_pyramid_depth
+from .exact import exact_search
+from .gray import gray_search, pattern_gray
+from .batch import map_patterns, search_many
+from .nms import NMS_MODES, reduce_hits, suppress_non_maxima, cluster_hits
+from .tiles import TileHasher, ChangeTracker, ImageDigest
+from .best import best_from_map, top_hits, search_best
+from .incremental import IncrementalSearch
+from .multiscale import LearnedScales, learned_scales, multiscale_search
+from .locality import LocalityStats, LastSeenIndex, last_seen_index
+
+
+SEARCH_MODES = {
+    'plain': plain_search,
+    'pyramid': pyramid_search,
+    'exact': exact_search,
+    'fft': fft_search,
+    'gray': gray_search,
+    'stripes': stripes_search,
+}
+
+
+def get_search_mode(pattern):
+    mode = pattern.get_search_mode()
+    if mode is None:
+        # Pixel-perfect patterns (Pattern.exact()) are searched by hashes -- much faster than by correlation:
+        mode = 'exact' if pattern.getSimilarity() >= 1.0 else pikuli.Settings.SearchMode
+    if mode not in SEARCH_MODES:
+        raise pikuli.FailExit('Unknown search mode {!r} of {!r}. Available: {}'.format(
+            mode, pattern, sorted(SEARCH_MODES)))
+    return mode
+
+
+def search(field, pattern):
+    return SEARCH_MODES[get_search_mode(pattern)](field, pattern)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""
+Matching of several patterns against one field. OpenCV releases the GIL inside
+`cv2.matchTemplate`, so patterns are matched in parallel on a shared thread pool. Many patterns
+share the transform of the field (see :mod:`pikuli.matching.fft`).
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pikuli
+from .fft import shared_field
+
+
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_workers
+    workers = pikuli.Settings.MatchThreads
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pikuli-match')
+            _executor_workers = workers
+    return _executor
+
+
+def map_patterns(func, patterns):
+    """
+    Returns `[func(p) for p in patterns]` computed on the thread pool. The order of the results is
+    the order of `patterns`. An exception of `func` is re-raised for the first pattern (in the order
+    of `patterns`) it happened for.
+    """
+    patterns = list(patterns)
+    if len(patterns) <= 1 or pikuli.Settings.MatchThreads <= 1:
+        return [func(p) for p in patterns]
+    return list(_get_executor().map(func, patterns))
+
+
+def search_many(field, patterns):
+    """
+    Searches every pattern from `patterns` in the same `field`.
+
+    :return: List of `(xs, ys, scores)` (see :func:`pikuli.matching.search`), one per pattern.
+    """
+    patterns = list(patterns)
+    with shared_field(field, len(patterns)):
+        return map_patterns(lambda p: pikuli.matching.search(field, p), patterns)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""
+Search of the best occurrences only (`find()`, `exists()`, waits). For the 'plain' mode the maximum
+of the score map is taken by `cv2.minMaxLoc`, without listing every position above the threshold.
+For the top-k the neighbourhood of every taken maximum (see :mod:`pikuli.matching.nms`) is
+suppressed before the next one is looked for. Other modes list their hits and pick the best of them
+by the same greedy pass over the hits drawn into a score map, so both ways give the same hits.
+
+Functions here have the contract of :func:`pikuli.matching.search`, but return at most `k` hits in
+the order of decreasing score; hits with equal scores go in the scan order.
+"""
+
+import cv2
+import numpy as np
+
+from .nms import _window
+from .plain import _BORDERLINE, exact_scores, score_map
+
+
+def best_from_map(res, similarity, k=1, w=1, h=1, overlap=None, field=None, pattern_img=None):
+    """
+    Up to `k` best positions of the score map `res` above `similarity`. `res` is not modified.
+    If `field` and `pattern_img` are given, scores within `_BORDERLINE` of the similarity are decided
+    by :func:`pikuli.matching.plain.exact_scores`, as :func:`pikuli.matching.plain.hits_above` does.
+    """
+    (xs, ys, scores) = ([], [], [])
+    if k > 1:
+        (kx, ky) = _window(w, h, overlap)
+    (threshold, rescored, copied) = (similarity, field is None, False)
+    while len(xs) < k:
+        (_, max_val, _, (x, y)) = cv2.minMaxLoc(res)
+        if not rescored and max_val <= similarity + _BORDERLINE:
+            # All the borderline positions are decided at once; the rejected ones drop out, the rest are hits:
+            loc = np.nonzero((res > similarity - _BORDERLINE) & (res <= similarity + _BORDERLINE))
+            if len(loc[0]) != 0:
+                reject = exact_scores(field, pattern_img, loc[1], loc[0]) <= similarity
+                if not copied:
+                    (res, copied) = (res.copy(), True)
+                res[loc[0][reject], loc[1][reject]] = -1.0
+            (threshold, rescored) = (similarity - _BORDERLINE, True)
+            continue
+        if not max_val > threshold:
+            break
+        xs.append(x)
+        ys.append(y)
+        scores.append(max_val)
+        if len(xs) < k:
+            if not copied:
+                (res, copied) = (res.copy(), True)
+            res[max(0, y - ky + 1):y + ky, max(0, x - kx + 1):x + kx] = -1.0
+    return np.array(xs, np.intp), np.array(ys, np.intp), np.array(scores, np.float32)
+
+
+def top_hits(xs, ys, scores, k=1, w=1, h=1, overlap=None):
+    """ Up to `k` best of the listed hits (in the scan order); for `k > 1` as :func:`best_from_map` takes them. """
+    if k == 1 or len(xs) == 0:
+        order = np.argsort(-scores, kind='stable')[:k]
+        return xs[order], ys[order], scores[order]
+    # Hits are drawn into a map over their bounding box; scores are never below 0, places without hits get -1:
+    (x0, y0) = (xs.min(), ys.min())
+    index = np.full((ys.max() - y0 + 1, xs.max() - x0 + 1), -1, np.intp)
+    index[ys - y0, xs - x0] = np.arange(len(xs))
+    res = np.full(index.shape, -1.0, np.float32)
+    res[ys - y0, xs - x0] = scores
+    (bx, by, _) = best_from_map(res, -1.0, k, w, h, overlap)
+    order = index[by, bx]
+    return xs[order], ys[order], scores[order]
+
+
+def search_best(field, pattern, k=1, overlap=None):
+    from . import get_search_mode, search  # Circular: the package imports this module.
+    if get_search_mode(pattern) == 'plain':
+        return best_from_map(score_map(field, pattern), pattern.getSimilarity(), k, pattern.getW(), pattern.getH(), overlap,
+                             field, pattern.get_image())
+    return top_hits(*search(field, pattern), k=k, w=pattern.getW(), h=pattern.getH(), overlap=overlap)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pixel-perfect search (similarity 1.0). Every pattern-sized window of the field gets a 64-bit
+polynomial hash, computed with running sums over rows and then over columns (Rabin--Karp in 2D).
+Only windows whose hash equals the pattern's one are compared with the pattern pixel by pixel,
+so the result is exact and costs a few passes of integer arithmetic over the field.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+# Odd bases are invertible modulo 2**64, that lets to "divide" running sums by powers of the base.
+_ROW_BASE = 0x9E3779B97F4A7C15
+_COL_BASE = 0xC2B2AE3D27D4EB4F
+_CONFIRM_CHUNK = 256
+
+_powers_cache = {}
+
+
+def sliding_windows(a, window_shape):
+    """
+    Read-only view of all windows of `a` of `window_shape` (one size per axis of `a`), the same as
+    `numpy.lib.stride_tricks.sliding_window_view` of numpy >= 1.20 gives.
+    """
+    window_shape = tuple(window_shape)
+    shape = tuple(n - k + 1 for n, k in zip(a.shape, window_shape)) + window_shape
+    return as_strided(a, shape=shape, strides=a.strides + a.strides, writeable=False)
+
+
+def _inverse(base):
+    """ Inverse of odd `base` modulo 2**64 (Newton's iteration; every step doubles the number of correct bits). """
+    inv = base
+    for _ in range(6):
+        inv = inv * (2 - base * inv) & 0xFFFFFFFFFFFFFFFF
+    return inv
+
+
+def _powers(base, n):
+    """ `(base**i, base**-i)` for `i` in `[0, n)` modulo 2**64 as `uint64` arrays. """
+    cached = _powers_cache.get(base)
+    if cached is None or len(cached[0]) < n:
+        inv = _inverse(base)
+        size = max(n, 2 * len(cached[0]) if cached is not None else 2048)
+        fwd = np.empty(size, np.uint64)
+        bwd = np.empty(size, np.uint64)
+        (f, b) = (1, 1)
+        for i in range(size):
+            fwd[i], bwd[i] = f, b
+            f = f * base & 0xFFFFFFFFFFFFFFFF
+            b = b * inv & 0xFFFFFFFFFFFFFFFF
+        cached = _powers_cache[base] = (fwd, bwd)
+    return cached[0][:n], cached[1][:n]
+
+
+def _pack(img):
+    """ One `uint64` value per pixel: the channel bytes side by side. """
+    if img.ndim == 2:
+        return img.astype(np.uint64)
+    packed = np.zeros(img.shape[:2], np.uint64)
+    for c in range(img.shape[2]):
+        packed |= img[:, :, c].astype(np.uint64) << np.uint64(8 * c)
+    return packed
+
+
+def _window_sums(values, size, base, axis):
+    """ Hashes of all windows of `size` along `axis`; the hash of a window does not depend on its position. """
+    n = values.shape[axis]
+    fwd, bwd = _powers(base, n)
+    shape = [1, 1]
+    shape[axis] = n
+    with np.errstate(over='ignore'):
+        weighted = values * fwd.reshape(shape)
+        sums = np.cumsum(weighted, axis=axis, dtype=np.uint64)
+        if axis == 1:
+            head = np.zeros((sums.shape[0], 1), np.uint64)
+            sums = np.concatenate((head, sums), axis=1)
+            diff = sums[:, size:] - sums[:, :-size]
+            return diff * bwd[:n - size + 1].reshape(1, -1)
+        head = np.zeros((1, sums.shape[1]), np.uint64)
+        sums = np.concatenate((head, sums), axis=0)
+        diff = sums[size:, :] - sums[:-size, :]
+        return diff * bwd[:n - size + 1].reshape(-1, 1)
+
+
+def window_hashes(img, w, h):
+    """ Hash map of all `w` x `h` windows of `img`; element `[y, x]` is the window with the top-left corner at `(x, y)`. """
+    return _window_sums(_window_sums(_pack(img), w, _ROW_BASE, axis=1), h, _COL_BASE, axis=0)
+
+
+def pattern_hash(pattern):
+    if pattern._exact_hash is None:
+        img = pattern.get_image()
+        pattern._exact_hash = window_hashes(img, img.shape[1], img.shape[0])[0, 0]
+    return pattern._exact_hash
+
+
+def exact_search(field, pattern):
+    """
+    The same contract as :func:`pikuli.matching.plain.plain_search`; every hit has the score 1.0.
+    """
+    img = pattern.get_image()
+    (ph, pw) = img.shape[:2]
+    empty = np.empty(0, dtype=np.intp)
+    if field.shape[0] < ph or field.shape[1] < pw or field.shape[2:] != img.shape[2:]:
+        return empty, empty, np.empty(0, dtype=np.float32)
+
+    (ys, xs) = np.nonzero(window_hashes(field, pw, ph) == pattern_hash(pattern))
+
+    # Hash collisions are possible, so candidates are confirmed by comparison of pixels:
+    windows = sliding_windows(field, img.shape)
+    if img.ndim == 3:
+        windows = windows[:, :, 0]
+    confirmed = np.zeros(len(xs), bool)
+    for i in range(0, len(xs), _CONFIRM_CHUNK):
+        chunk = windows[ys[i:i + _CONFIRM_CHUNK], xs[i:i + _CONFIRM_CHUNK]]
+        confirmed[i:i + _CONFIRM_CHUNK] = (chunk == img).reshape(len(chunk), -1).all(axis=1)
+
+    return xs[confirmed], ys[confirmed], np.ones(int(np.count_nonzero(confirmed)), np.float32)
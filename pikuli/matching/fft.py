@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""
+`TM_CCORR_NORMED` by means of the Fourier transform, for many patterns in one field. The field is
+transformed once; the spectrum of every pattern (zero-padded to the transform size of the field) is
+cached in the pattern. A score map then costs one multiplication of spectra per channel and one
+inverse transform. The normalization takes window energies of the field from an integral image.
+
+Pattern spectra are as big as the field, so a pattern keeps them (in `float32`) for one transform
+size only, and all of them together are bounded by what `Settings.PatternCacheMaxBytes` leaves
+after the decoded images of :data:`pikuli.pattern_cache.pattern_image_cache`.
+
+Circular correlation of the padded spectra equals the linear one for all positions where the
+pattern lies inside the field, so the transform size needs to cover the field only.
+
+A field is shared inside :func:`shared_field`; :func:`pikuli.matching.plain.score_map` uses its
+spectra automatically, so the 'plain' mode keeps its results and only changes the way to get them.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+import pikuli
+from pikuli.pattern_cache import pattern_image_cache
+
+
+_shared = []  # FieldSpectra of the fields inside shared_field().
+_shared_lock = threading.Lock()
+
+
+class _PatternSpectraCache(object):
+    """ Least recently used pattern spectra are dropped (`pattern._spectra = None`) when over the limit. """
+
+    def __init__(self):
+        self._entries = OrderedDict()  # id(pattern) -> (weakref to pattern, nbytes)
+        self._nbytes = 0
+        self._lock = threading.RLock()  # The weakref callback may come while the lock is held.
+
+    def get(self, pattern, dft_shape):
+        with self._lock:
+            cached = pattern._spectra
+            if cached is None or cached[0] != dft_shape:
+                return None
+            if id(pattern) in self._entries:
+                self._entries.move_to_end(id(pattern))
+            return cached[1]
+
+    def put(self, pattern, dft_shape, spectra):
+        nbytes = sum(s.nbytes for s in spectra)
+        limit = pikuli.Settings.PatternCacheMaxBytes - pattern_image_cache.stats().nbytes
+        key = id(pattern)
+        with self._lock:
+            self._forget(key)
+            pattern._spectra = None
+            if nbytes > limit:
+                return
+            pattern._spectra = (dft_shape, spectra)
+            ref = weakref.ref(pattern, lambda ref, key=key: self._forget(key, ref))
+            self._entries[key] = (ref, nbytes)
+            self._nbytes += nbytes
+            while self._nbytes > limit:
+                _, (ref, evicted) = self._entries.popitem(last=False)
+                self._nbytes -= evicted
+                evicted_pattern = ref()
+                if evicted_pattern is not None:
+                    evicted_pattern._spectra = None
+
+    def _forget(self, key, ref=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (ref is None or entry[0] is ref):
+                del self._entries[key]
+                self._nbytes -= entry[1]
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+
+pattern_spectra_cache = _PatternSpectraCache()
+
+
+class FieldSpectra(object):
+    """ The transform and the integral image of window energies of one field (computed lazily, once). """
+
+    def __init__(self, field):
+        self.field = field
+        h, w = field.shape[:2]
+        self.dft_shape = (cv2.getOptimalDFTSize(h), cv2.getOptimalDFTSize(w))
+        self._lock = threading.Lock()
+        self._spectra = None
+        self._sq_integral = None
+        self._window_energies = {}
+
+    def _planes(self, img):
+        return [img] if img.ndim == 2 else [img[:, :, c] for c in range(img.shape[2])]
+
+    def _dft(self, plane, dtype=np.float64):
+        padded = np.zeros(self.dft_shape, dtype)
+        padded[:plane.shape[0], :plane.shape[1]] = plane
+        # Packed (CCS) spectrum of a real plane: half of the data of the full complex one.
+        return cv2.dft(padded)
+
+    def _prepare(self):
+        with self._lock:
+            if self._spectra is None:
+                planes = self._planes(self.field)
+                energy = sum(np.square(p, dtype=np.float64) for p in planes)
+                self._sq_integral = cv2.integral(energy, sdepth=cv2.CV_64F)
+                self._spectra = [self._dft(p) for p in planes]
+
+    def _window_energy(self, w, h):
+        # Sums of squares over all w x h windows; patterns of the same size share them.
+        energy = self._window_energies.get((w, h))
+        if energy is None:
+            s = self._sq_integral
+            energy = self._window_energies[(w, h)] = s[h:, w:] - s[:-h, w:] - s[h:, :-w] + s[:-h, :-w]
+        return energy
+
+    def pattern_spectra(self, pattern):
+        # The spectra depend on the pattern pixels and the transform size only -- stored in the pattern:
+        spectra = pattern_spectra_cache.get(pattern, self.dft_shape)
+        if spectra is None:
+            spectra = [self._dft(p, np.float32) for p in self._planes(pattern.get_image())]
+            pattern_spectra_cache.put(pattern, self.dft_shape, spectra)
+        return spectra
+
+    def match(self, pattern):
+        """ Score map of `pattern`, the same as :func:`pikuli.matching.plain.match_template` gives. """
+        self._prepare()
+        img = pattern.get_image()
+        (ph, pw) = img.shape[:2]
+        (fh, fw) = self.field.shape[:2]
+
+        product = None
+        for f_spec, p_spec in zip(self._spectra, self.pattern_spectra(pattern)):
+            # The product is taken in float64: the scores are compared with thresholds like 0.995.
+            m = cv2.mulSpectrums(f_spec, p_spec.astype(np.float64), 0, conjB=True)
+            product = m if product is None else cv2.add(product, m)
+        corr = cv2.idft(product, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)[:fh - ph + 1, :fw - pw + 1]
+
+        norm = np.sqrt(self._window_energy(pw, ph) * np.square(img, dtype=np.float64).sum())
+        res = np.zeros(corr.shape, np.float32)
+        np.divide(corr, norm, out=res, where=norm > 0, casting='unsafe')
+        return np.minimum(res, 1.0, out=res)
+
+
+@contextmanager
+def shared_field(field, n_patterns):
+    """
+    Lets the searches of `n_patterns` patterns in `field` share its transform. Sharing pays off from
+    `Settings.FftMinPatterns` patterns; with fewer ones (or `None` in the setting) nothing changes.
+    The field must not be modified inside the block.
+    """
+    min_patterns = pikuli.Settings.FftMinPatterns
+    spectra = None
+    if min_patterns is not None and n_patterns >= min_patterns and shared_spectra(field) is None:
+        spectra = FieldSpectra(field)
+        with _shared_lock:
+            _shared.append(spectra)
+    try:
+        yield
+    finally:
+        if spectra is not None:
+            with _shared_lock:
+                _shared.remove(spectra)
+
+
+def shared_spectra(field):
+    """ :class:`FieldSpectra` of `field` if it is shared now (see :func:`shared_field`), else `None`. """
+    with _shared_lock:
+        for spectra in _shared:
+            if spectra.field is field:
+                return spectra
+    return None
+
+
+def fft_search(field, pattern):
+    """
+    The same contract as :func:`pikuli.matching.plain.plain_search`. Outside of
+    :func:`shared_field` the field is transformed for this pattern alone.
+    """
+    spectra = shared_spectra(field) or FieldSpectra(field)
+    res = spectra.match(pattern)
+    from .plain import hits_above  # Circular: plain uses this module.
+    return hits_above(res, field, pattern)
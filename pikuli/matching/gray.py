@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+Grayscale-first search. The field and the pattern are correlated on one luminance channel (a third
+of the data of BGR), with the threshold lowered by `Settings.GraySimilaritySlack`. Candidates are
+then verified in full colour by the same `TM_CCORR_NORMED` over BGR, so a red and a green dot of
+the same brightness are told apart exactly as by :func:`pikuli.matching.plain.plain_search`.
+"""
+
+import cv2
+import numpy as np
+
+import pikuli
+from .plain import match_template, plain_search, hits_above
+
+
+def pattern_gray(pattern):
+    """ `uint8` luminance of the pattern (cached in the pattern). """
+    if pattern._gray is None:
+        pattern._gray = cv2.cvtColor(pattern.get_image(), cv2.COLOR_BGR2GRAY)
+    return pattern._gray
+
+
+def gray_search(field, pattern):
+    """
+    The same contract as :func:`pikuli.matching.plain.plain_search`; the scores are the colour ones.
+    """
+    img = pattern.get_image()
+    if field.ndim == 2 or img.ndim == 2:
+        return plain_search(field, pattern)
+    (ph, pw) = img.shape[:2]
+
+    gray_res = match_template(cv2.cvtColor(field, cv2.COLOR_BGR2GRAY), pattern_gray(pattern))
+    candidates = (gray_res > pattern.getSimilarity() - pikuli.Settings.GraySimilaritySlack).astype(np.uint8)
+
+    # Colour verification over the bounding boxes of candidate groups:
+    res = np.zeros(gray_res.shape, np.float32)
+    n_labels, _, stats, _ = cv2.connectedComponentsWithStats(candidates, connectivity=8)
+    for x0, y0, w, h, _ in stats[1:n_labels]:
+        res[y0:y0 + h, x0:x0 + w] = match_template(field[y0:y0 + h + ph - 1, x0:x0 + w + pw - 1], img)
+
+    return hits_above(res, field, pattern)
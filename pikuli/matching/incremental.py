@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""
+Repeated search in a changing field (waiting for a pattern to appear or vanish). The score map of
+every pattern is kept between attempts; after a change only the score map windows which overlap
+the changed rectangles are recomputed.
+"""
+
+from .plain import match_template, score_map, hits_above
+from .best import best_from_map
+from .tiles import ChangeTracker
+
+
+class IncrementalSearch(object):
+
+    def __init__(self, tile=None):
+        self._tracker = ChangeTracker(tile)
+        self._changes = None
+        self._score_maps = {}
+
+    def update(self, field):
+        """
+        Registers the new field. Returns `False` if nothing has changed since the previous one,
+        so the previous search results are still valid.
+        """
+        self._changes = self._tracker.update(field)
+        if self._changes is None:
+            self._score_maps = {}
+        return self._changes is None or len(self._changes) > 0
+
+    def forget(self, pattern):
+        """ Drops the score maps of `pattern` (and of its scaled copies): it has not been searched in some field. """
+        for p in [pattern] + list(pattern._scaled_copies.values()):
+            self._score_maps.pop(id(p), None)
+
+    def _score_map(self, field, pattern):
+        img = pattern.get_image()
+        res = self._score_maps.get(id(pattern))
+        if res is None or self._changes is None:
+            res = self._score_maps[id(pattern)] = score_map(field, pattern)
+        else:
+            ph, pw = img.shape[:2]
+            res_h, res_w = res.shape
+            for x, y, w, h in self._changes:
+                # Score map positions whose pattern window intersects the changed rectangle:
+                x0, y0 = max(0, x - pw + 1), max(0, y - ph + 1)
+                x1, y1 = min(res_w, x + w), min(res_h, y + h)
+                if x0 < x1 and y0 < y1:
+                    res[y0:y1, x0:x1] = match_template(field[y0:y1 + ph - 1, x0:x1 + pw - 1], img)
+        return res
+
+    def search(self, field, pattern):
+        """ The same contract as :func:`pikuli.matching.search`. """
+        from . import get_search_mode, search  # Circular: the package imports this module.
+        if get_search_mode(pattern) != 'plain':
+            return search(field, pattern)
+
+        return hits_above(self._score_map(field, pattern), field, pattern)
+
+    def search_best(self, field, pattern, k=1, overlap=None):
+        """ The same contract as :func:`pikuli.matching.best.search_best`. """
+        from . import get_search_mode, search_best  # Circular: the package imports this module.
+        if get_search_mode(pattern) != 'plain':
+            return search_best(field, pattern, k, overlap)
+        return best_from_map(self._score_map(field, pattern), pattern.getSimilarity(), k, pattern.getW(), pattern.getH(), overlap,
+                             field, pattern.get_image())
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Index of the last positions where patterns were found, per pattern and per region. Most controls
+stay where they were, so :class:`pikuli.Region` first searches a small window around the last
+position (`Settings.LocalityMargin` pixels around it) and scans the whole field only on a miss.
+
+The index may be saved to a JSON file and loaded back, so a new process starts warm. If
+`Settings.LastSeenIndexFile` is set, the index is loaded from it on first use.
+"""
+
+import json
+import os
+import threading
+from collections import namedtuple
+
+import pikuli
+
+
+LocalityStats = namedtuple('LocalityStats', 'hits misses cold entries')
+
+
+class LastSeenIndex(object):
+
+    def __init__(self):
+        self._entries = {}  # (pattern path, region rect) -> (x, y, w, h) of the last match
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._hits = 0
+        self._misses = 0
+        self._cold = 0
+
+    @staticmethod
+    def _key(pattern, region):
+        # Patterns without a file are told apart by identity and are not saved.
+        return (pattern._path if pattern._path is not None else id(pattern),
+                (region.x, region.y, region.w, region.h))
+
+    def _autoload(self):
+        if not self._loaded:
+            self._loaded = True
+            path = pikuli.Settings.LastSeenIndexFile
+            if path is not None and os.path.isfile(path):
+                self.load(path)
+
+    def get(self, pattern, region):
+        """ Returns `(x, y, w, h)` of the last match of `pattern` in `region` or `None`. """
+        self._autoload()
+        with self._lock:
+            rect = self._entries.get(self._key(pattern, region))
+            if rect is None:
+                self._cold += 1
+            return rect
+
+    def remember(self, pattern, region, rect):
+        with self._lock:
+            self._entries[self._key(pattern, region)] = tuple(int(v) for v in rect)
+
+    def count(self, hit):
+        """ Registers the result of a search near the last position. """
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def stats(self):
+        with self._lock:
+            return LocalityStats(self._hits, self._misses, self._cold, len(self._entries))
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = self._misses = self._cold = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def save(self, path=None):
+        """ Writes the entries of file patterns to `path` (`None` -- `Settings.LastSeenIndexFile`). """
+        path = path or pikuli.Settings.LastSeenIndexFile
+        if path is None:
+            raise pikuli.FailExit('LastSeenIndex.save(): no path and Settings.LastSeenIndexFile is not set')
+        with self._lock:
+            entries = [{'pattern': p, 'region': list(r), 'rect': list(rect)}
+                       for (p, r), rect in self._entries.items() if isinstance(p, str)]
+        with open(path, 'w') as f:
+            json.dump(entries, f, indent=1)
+
+    def load(self, path=None):
+        """ Adds the entries from `path` (`None` -- `Settings.LastSeenIndexFile`) to the index. """
+        path = path or pikuli.Settings.LastSeenIndexFile
+        with open(path) as f:
+            entries = json.load(f)
+        with self._lock:
+            self._loaded = True
+            for e in entries:
+                self._entries[(e['pattern'], tuple(e['region']))] = tuple(e['rect'])
+
+    def __repr__(self):
+        return '<LastSeenIndex {}>'.format(self.stats())
+
+
+last_seen_index = LastSeenIndex()
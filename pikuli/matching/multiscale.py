@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+Search of a pattern drawn at another display scaling (100%, 125%, 150%, ...). The pattern is
+resized by each factor of `Pattern.get_scales()` and the copies are searched one by one in the same
+field until some of them is found. The winning factor is remembered per (pattern, screen), so the
+next searches on this screen try it first and usually stop after one pass.
+"""
+
+import threading
+
+import numpy as np
+
+import pikuli
+
+
+class LearnedScales(object):
+    """ Thread-safe mapping `(pattern, screen) -> scale` of the last successful searches. """
+
+    def __init__(self):
+        self._scales = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(pattern, screen):
+        # Copies of one file share the learned scale; patterns without a file are told apart by identity.
+        return (pattern._path if pattern._path is not None else id(pattern), screen)
+
+    def get(self, pattern, screen):
+        with self._lock:
+            return self._scales.get(self._key(pattern, screen))
+
+    def remember(self, pattern, screen, scale):
+        with self._lock:
+            self._scales[self._key(pattern, screen)] = scale
+
+    def forget(self, pattern, screen):
+        with self._lock:
+            self._scales.pop(self._key(pattern, screen), None)
+
+    def clear(self):
+        with self._lock:
+            self._scales.clear()
+
+    def __len__(self):
+        return len(self._scales)
+
+
+learned_scales = LearnedScales()
+
+
+def scale_order(pattern, screen):
+    """ Scales of `pattern` in the order of trying: the learned one first, the rest as given. """
+    scales = list(pattern.get_scales())
+    learned = learned_scales.get(pattern, screen)
+    if learned in scales:
+        scales.remove(learned)
+        scales.insert(0, learned)
+    return scales
+
+
+def multiscale_search(field, pattern, screen=None, search=None):
+    """
+    :param screen: Any hashable key of the screen the field is taken from.
+    :param search: Engine with the contract of :func:`pikuli.matching.search` (the default one).
+    :return: `(scaled_pattern, xs, ys, scores)` -- the copy of `pattern` (see `Pattern.scaled()`)
+             whose hits are returned, so its size is the size of the hits. A pattern without scales
+             is searched as is.
+    """
+    if search is None:
+        search = pikuli.matching.search
+    if not pattern.get_scales():
+        return (pattern,) + tuple(search(field, pattern))
+
+    field_h, field_w = field.shape[:2]
+    for scale in scale_order(pattern, screen):
+        scaled = pattern.scaled(scale)
+        if scaled.getW() > field_w or scaled.getH() > field_h:
+            continue
+        (xs, ys, scores) = search(field, scaled)
+        if len(xs) != 0:
+            learned_scales.remember(pattern, screen, scale)
+            return scaled, xs, ys, scores
+
+    empty = np.empty(0, dtype=np.intp)
+    return pattern, empty, empty, np.empty(0, dtype=np.float32)
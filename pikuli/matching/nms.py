@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reduction of raw hits (every position above the similarity threshold) to distinct occurrences.
+
+Two hits of a pattern of size `w x h` are treated as the same occurrence if
+`|dx| < overlap * w` and `|dy| < overlap * h`. With `overlap = 1.0` that means the matched
+rectangles intersect.
+
+Both reductions rasterize the hits into a grid over the bounding box of the hits, so the cost
+depends on this area and not on the square of the number of hits.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+import pikuli
+
+
+NMS_MODES = ['peaks', 'cluster']
+
+
+def _window(w, h, overlap):
+    """ Returns `(kx, ky)`: hits are neighbours if `|dx| < kx` and `|dy| < ky`. """
+    if overlap is None:
+        overlap = pikuli.Settings.NmsOverlap
+    if not overlap > 0:
+        raise pikuli.FailExit('overlap should be positive: {!r}'.format(overlap))
+    return max(1, int(math.ceil(overlap * w))), max(1, int(math.ceil(overlap * h)))
+
+
+def _line_groups(major, minor, gap):
+    """
+    Groups hits lying on lines: equal `major` coordinate and steps of `minor` less than `gap`
+    between consecutive hits. Returns `(labels, starts)`: the group of every hit and the index of
+    the first (smallest `minor`) hit of every group.
+    """
+    order = np.lexsort((minor, major))
+    m, n = major[order], minor[order]
+    new = np.ones(len(order), bool)
+    new[1:] = (m[1:] != m[:-1]) | (n[1:] - n[:-1] >= gap)
+    labels = np.empty(len(order), np.intp)
+    labels[order] = np.cumsum(new) - 1
+    return labels, order[new]
+
+
+def _plateau_representatives(xs, ys, candidates, kx, ky):
+    """
+    Thins plateaus of equal local maxima. Candidates adjacent to each other are neighbours, so
+    their scores are equal -- such connected groups are plateaus. Inside a plateau one candidate
+    is kept per `kx x ky` cell counted from the corner of the plateau: the first one in the scan
+    order. `candidates` should be in the scan order; the kept ones are returned in this order too.
+    """
+    cx, cy = xs[candidates], ys[candidates]
+    if kx > 1 and ky > 1:
+        x0, y0 = cx.min(), cy.min()
+        mask = np.zeros((cy.max() - y0 + 1, cx.max() - x0 + 1), np.uint8)
+        mask[cy - y0, cx - x0] = 1
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        labels = labels[cy - y0, cx - x0]
+        ox, oy = stats[labels, cv2.CC_STAT_LEFT] + x0, stats[labels, cv2.CC_STAT_TOP] + y0
+    else:
+        # Adjacent candidates are neighbours along one axis only: plateaus are runs on lines.
+        if kx == 1:
+            labels, starts = _line_groups(cx, cy, 2)
+        else:
+            labels, starts = _line_groups(cy, cx, 2)
+        ox, oy = cx[starts][labels], cy[starts][labels]
+
+    cell_x, cell_y = (cx - ox) // kx, (cy - oy) // ky
+    nx, ny = int(cell_x.max()) + 1, int(cell_y.max()) + 1
+    keys = (labels.astype(np.int64) * ny + cell_y) * nx + cell_x
+    _, first = np.unique(keys, return_index=True)
+    return candidates[np.sort(first)]
+
+
+def suppress_non_maxima(xs, ys, scores, w, h, overlap=None):
+    """
+    Keeps the hits which have the highest score in their neighbourhood. Plateaus of equal scores
+    are thinned, so no two kept hits are neighbours: of two neighbours the one with the higher
+    score (then the earlier in the scan order) wins.
+
+    A hit with a better neighbour is dropped even if that neighbour is dropped in turn, so this is
+    not the one-by-one greedy pass of :mod:`pikuli.matching.best`: on a slope of scores it keeps
+    only the top.
+
+    :return: `(xs, ys, scores)` of kept hits in the scan order.
+    """
+    if len(xs) == 0:
+        return xs, ys, scores
+    kx, ky = _window(w, h, overlap)
+
+    x0, y0 = xs.min(), ys.min()
+    grid = np.zeros((ys.max() - y0 + 1, xs.max() - x0 + 1), np.float32)
+    grid[ys - y0, xs - x0] = scores
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * kx - 1, 2 * ky - 1))
+    local_max = cv2.dilate(grid, kernel)
+    candidates = np.flatnonzero(scores >= local_max[ys - y0, xs - x0])
+    scan = (ys[candidates] - y0).astype(np.int64) * grid.shape[1] + (xs[candidates] - x0)
+    if np.any(scan[1:] < scan[:-1]):
+        candidates = candidates[np.argsort(scan, kind='stable')]
+    if kx > 1 or ky > 1:
+        candidates = _plateau_representatives(xs, ys, candidates, kx, ky)
+
+    # The rest is greedy selection among the candidates by priority (score, then the scan order)
+    # done in parallel rounds: a candidate wins if it has the highest priority among alive
+    # neighbours; winners and their neighbours leave. Over the candidates it keeps the same hits as
+    # the one-by-one greedy pass. After thinning of plateaus conflicts are rare, so there are a few
+    # rounds.
+    order = candidates[np.argsort(-scores[candidates], kind='stable')]
+    cx, cy = xs[order] - x0, ys[order] - y0
+    rank = np.arange(len(order), 0, -1, dtype=np.float64)
+    alive = np.ones(len(order), bool)
+    kept = np.zeros(len(order), bool)
+    ranks = np.zeros(grid.shape, np.float64)
+    covered = np.zeros(grid.shape, np.uint8)
+    while alive.any():
+        ranks[:] = 0
+        ranks[cy[alive], cx[alive]] = rank[alive]
+        winners = alive & (rank == cv2.dilate(ranks, kernel)[cy, cx])
+        kept |= winners
+        covered[:] = 0
+        covered[cy[winners], cx[winners]] = 1
+        alive &= cv2.dilate(covered, kernel)[cy, cx] == 0
+
+    kept = np.sort(order[kept])
+    return xs[kept], ys[kept], scores[kept]
+
+
+def cluster_hits(xs, ys, scores, w, h, overlap=None):
+    """
+    Groups hits transitively: if `a` neighbours `b` and `b` neighbours `c`, then all three are in
+    one group. Every group is replaced by the score-weighted mean position and the mean score.
+
+    :return: `(xs, ys, scores)`; `xs` and `ys` are float arrays.
+    """
+    if len(xs) == 0:
+        return xs.astype(np.float64), ys.astype(np.float64), scores
+    kx, ky = _window(w, h, overlap)
+
+    if kx == 1 and ky == 1:
+        groups = np.arange(len(xs))
+    elif kx == 1:
+        # Neighbours are in the same column only.
+        groups, _ = _line_groups(xs, ys, ky)
+    elif ky == 1:
+        groups, _ = _line_groups(ys, xs, kx)
+    else:
+        # Each hit is drawn as a box of (kx - 1) x (ky - 1) pixels. Such boxes are 8-connected
+        # (overlap or touch) exactly when |dx| < kx and |dy| < ky.
+        x0, y0 = xs.min(), ys.min()
+        grid = np.zeros((ys.max() - y0 + ky + 1, xs.max() - x0 + kx + 1), np.uint8)
+        grid[ys - y0, xs - x0] = 1
+        if kx > 2 or ky > 2:
+            kernel = np.ones((ky - 1, kx - 1), np.uint8)
+            grid = cv2.dilate(grid, kernel, anchor=(kernel.shape[1] - 1, kernel.shape[0] - 1))
+        _, labels = cv2.connectedComponents(grid, connectivity=8)
+        _, groups = np.unique(labels[ys - y0, xs - x0], return_inverse=True)
+
+    sum_scores = np.bincount(groups, weights=scores)
+    counts = np.bincount(groups)
+    cx = np.bincount(groups, weights=xs * scores) / sum_scores
+    cy = np.bincount(groups, weights=ys * scores) / sum_scores
+    return cx, cy, (sum_scores / counts).astype(np.float32)
+
+
+def reduce_hits(xs, ys, scores, w, h, nms, overlap=None):
+    """ Applies the reduction `nms` (one of `NMS_MODES` or `None`) to raw hits. """
+    if nms is None:
+        return xs, ys, scores
+    if nms == 'peaks':
+        return suppress_non_maxima(xs, ys, scores, w, h, overlap)
+    if nms == 'cluster':
+        return cluster_hits(xs, ys, scores, w, h, overlap)
+    raise pikuli.FailExit('Unknown nms = {!r}. Available: {}'.format(nms, NMS_MODES))
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import cv2
+import numpy as np
+
+import pikuli
+
+from .fft import shared_spectra
+from .exact import sliding_windows
+from .stripes import use_stripes, striped_match_template
+
+
+# Scores this close to the similarity are recomputed exactly (see hits_above()):
+_BORDERLINE = 1e-5
+
+
+def match_template(field, pattern_img):
+    """
+    Returns the `TM_CCORR_NORMED` score map of `pattern_img` over `field`. Element `[y, x]` is
+    the score of the pattern placed with its top-left corner at `(x, y)` of the field. Very large
+    fields are matched by stripes in parallel (see :mod:`pikuli.matching.stripes`).
+    """
+    if use_stripes(field, pattern_img):
+        return striped_match_template(field, pattern_img)
+    return cv2.matchTemplate(field, pattern_img, cv2.TM_CCORR_NORMED)
+
+
+def score_map(field, pattern):
+    """
+    Score map of `pattern` (:class:`pikuli.Pattern`) over the whole `field`. When the field is
+    shared among many patterns (see :func:`pikuli.matching.fft.shared_field`), its transform is
+    reused instead of `cv2.matchTemplate`. Otherwise positions which can not reach the similarity
+    are rejected beforehand (see :mod:`pikuli.matching.prefilter`) and get 0.
+    """
+    spectra = shared_spectra(field)
+    if spectra is not None:
+        return spectra.match(pattern)
+    if pikuli.Settings.Prefilter:
+        from .prefilter import prefiltered_score_map  # Circular: prefilter uses match_template().
+        return prefiltered_score_map(field, pattern)
+    return match_template(field, pattern.get_image())
+
+
+def plain_search(field, pattern):
+    """
+    Full resolution search of `pattern` (:class:`pikuli.Pattern`) in `field`.
+
+    :return: `(xs, ys, scores)` -- numpy arrays of all positions (in the field coordinates) where
+             the score is above the pattern similarity. Positions are in row-major (scan) order.
+    """
+    return hits_above(score_map(field, pattern), field, pattern)
+
+
+def exact_scores(field, pattern_img, xs, ys):
+    """ `TM_CCORR_NORMED` scores at the given positions computed directly in float64. """
+    img = pattern_img.astype(np.float64)
+    t_norm = np.sqrt(np.square(img).sum())
+    windows = sliding_windows(field, pattern_img.shape)
+    if pattern_img.ndim == 3:
+        windows = windows[:, :, 0]
+    w = windows[ys, xs].astype(np.float64).reshape(len(xs), -1)
+    num = np.dot(w, img.ravel())
+    den = np.sqrt(np.square(w).sum(axis=1)) * t_norm
+    return np.divide(num, den, out=np.zeros(len(xs)), where=den > 0)
+
+
+def hits_above(res, field, pattern):
+    """
+    Positions of the score map `res` with the score above the pattern similarity: `(xs, ys, scores)`
+    in the scan order. The float32 score maps of different ways (a single `cv2.matchTemplate` call,
+    stripes, FFT) differ in the last bits, so scores within `_BORDERLINE` of the threshold are decided
+    by :func:`exact_scores` -- the hits are the same whatever way the map was computed.
+    """
+    similarity = pattern.getSimilarity()
+    loc = np.where(res > similarity - _BORDERLINE)
+    (xs, ys, scores) = (loc[1], loc[0], res[loc])
+    borderline = np.nonzero(scores <= similarity + _BORDERLINE)[0]
+    if len(borderline) != 0:
+        keep = np.ones(len(xs), bool)
+        keep[borderline] = exact_scores(field, pattern.get_image(), xs[borderline], ys[borderline]) > similarity
+        (xs, ys, scores) = (xs[keep], ys[keep], scores[keep])
+    return xs, ys, scores
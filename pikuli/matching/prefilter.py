@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+Rejection of positions by statistics before the correlation. `TM_CCORR_NORMED` is the cosine of
+the angle between the pattern and a field window taken as vectors. Splitting each channel into its
+mean and the deviation from it, the Cauchy--Schwarz inequality gives the upper bound
+
+    score <= sum_c(mT_c * mI_c + sT_c * sI_c) / sqrt(sum_c(mT_c**2 + sT_c**2) * sum_c(mI_c**2 + sI_c**2))
+
+where `m` and `s` are the per-channel means and standard deviations of the pattern (T) and of the
+window (I). Window statistics come from box filters (running sums, like integral images) in O(1) per position. Positions whose bound
+is below the similarity can not be hits, so the correlation runs only around the rest: there are no
+false negatives by construction.
+
+Histograms are not used: they do not bound the correlation from above.
+"""
+
+import cv2
+import numpy as np
+
+import pikuli
+from .plain import match_template
+
+
+# Tolerance for rounding of the float32 scores of `cv2.matchTemplate`:
+_EPS = 1e-5
+
+
+def pattern_stats(pattern):
+    """ Per-channel `(means, standard deviations)` of the pattern pixels (cached in the pattern). """
+    if pattern._prefilter_stats is None:
+        img = pattern.get_image().astype(np.float64)
+        img = img.reshape(img.shape[0] * img.shape[1], -1)
+        pattern._prefilter_stats = (img.mean(axis=0), img.std(axis=0))
+    return pattern._prefilter_stats
+
+
+def score_bound(field, pattern):
+    """ Upper bound of the score for every position of `pattern` in `field` (the shape of the score map). """
+    (ph, pw) = pattern.get_image().shape[:2]
+    return _bound(field, pw, ph, *pattern_stats(pattern))
+
+
+def _bound(field, pw, ph, t_mean, t_std):
+    # Window means and means of squares (box filters are computed by running sums, so in O(1) per
+    # position); float64 keeps the bound sound:
+    (res_h, res_w) = (field.shape[0] - ph + 1, field.shape[1] - pw + 1)
+    if res_h <= 0 or res_w <= 0:
+        return np.zeros((max(0, res_h), max(0, res_w)), np.float64)  # The pattern does not fit anywhere.
+    i_mean = cv2.boxFilter(field, cv2.CV_64F, (pw, ph), anchor=(0, 0), borderType=cv2.BORDER_CONSTANT)[:res_h, :res_w]
+    i_energy = cv2.sqrBoxFilter(field, cv2.CV_64F, (pw, ph), anchor=(0, 0), borderType=cv2.BORDER_CONSTANT)[:res_h, :res_w]  # == mean**2 + std**2
+    i_std = cv2.sqrt(cv2.max(cv2.subtract(i_energy, cv2.multiply(i_mean, i_mean)), 0.0))
+
+    # Sums over channels by cv2.transform() with a row of weights:
+    num = cv2.add(cv2.transform(i_mean, t_mean.reshape(1, -1)), cv2.transform(i_std, t_std.reshape(1, -1)))
+    den = cv2.transform(i_energy, np.ones((1, len(t_mean))))
+    den = cv2.sqrt(den * float((np.square(t_mean) + np.square(t_std)).sum()))
+    bound = cv2.divide(num, den)  # 0 where den == 0 -- matchTemplate gives 0 there as well.
+    return bound
+
+
+def prefiltered_score_map(field, pattern):
+    """
+    Score map like :func:`pikuli.matching.plain.match_template` gives, but computed only around the
+    positions that pass :func:`score_bound`; the others get 0. If too many positions pass
+    (`Settings.PrefilterMaxSurvivorsRatio`), the whole map is computed.
+    """
+    img = pattern.get_image()
+    (ph, pw) = img.shape[:2]
+    threshold = pattern.getSimilarity() - _EPS
+    max_ratio = pikuli.Settings.PrefilterMaxSurvivorsRatio
+    if field.shape[0] < ph or field.shape[1] < pw:
+        # No positions at all; the box filters would be sliced to nothing. cv2.matchTemplate raises cv2.error
+        # here, as the search without the prefilter does:
+        return match_template(field, img)
+
+    # The share of survivors is estimated on the field reduced 4 times beforehand: if the prefilter will
+    # not pay off, it costs about 1/16 of its full price. The estimate affects the speed only.
+    if min(ph, pw) >= 8:
+        sample = _bound(field[::4, ::4], pw // 4, ph // 4, *pattern_stats(pattern))
+        if np.count_nonzero(sample >= threshold) > max_ratio * sample.size:
+            return match_template(field, img)
+
+    survivors = (score_bound(field, pattern) >= threshold).astype(np.uint8)
+    n_survivors = int(np.count_nonzero(survivors))
+    if n_survivors > max_ratio * survivors.size:
+        return match_template(field, img)
+
+    res = np.zeros(survivors.shape, np.float32)
+    if n_survivors == 0:
+        return res
+    # Close survivors are merged, so the correlation runs over a few boxes, not over single positions:
+    survivors = cv2.dilate(survivors, np.ones((9, 9), np.uint8))
+    n_labels, _, stats, _ = cv2.connectedComponentsWithStats(survivors, connectivity=8)
+    for x0, y0, w, h, _ in stats[1:n_labels]:
+        res[y0:y0 + h, x0:x0 + w] = match_template(field[y0:y0 + h + ph - 1, x0:x0 + w + pw - 1], img)
+    return res
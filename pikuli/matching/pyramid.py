@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+Coarse-to-fine search. Both the field and the pattern are reduced by `cv2.pyrDown` several times,
+the reduced copies are matched with a relaxed threshold and then only the neighbourhoods of the
+coarse candidates are matched once more at full resolution. Scores are taken from the full
+resolution pass only, so the hits are the same as :func:`pikuli.matching.plain.plain_search`
+would give in those neighbourhoods.
+"""
+
+import cv2
+import numpy as np
+
+import pikuli
+from .plain import match_template, plain_search, hits_above
+
+
+def pyrdown(img, depth):
+    for _ in range(depth):
+        img = cv2.pyrDown(img)
+    return img
+
+
+def pattern_pyramid_depth(pattern):
+    """
+    Maximum pyramid depth for `pattern`. The pattern side must stay not less than
+    `Settings.PyramidMinPatternSide` pixels, so small icons are searched at shallow levels only.
+    `Pattern.get_pyramid_depth()` (if it is not `None`) bounds the depth additionally.
+    """
+    max_depth = pikuli.Settings.PyramidMaxDepth
+    if pattern.get_pyramid_depth() is not None:
+        max_depth = min(max_depth, pattern.get_pyramid_depth())
+
+    min_side = min(pattern.getW(), pattern.getH())
+    depth = 0
+    while depth < max_depth and (min_side >> (depth + 1)) >= pikuli.Settings.PyramidMinPatternSide:
+        depth += 1
+    return depth
+
+
+def _pattern_level(pattern, depth):
+    # Reduced copies are stored in the pattern. They depend on its pixels only.
+    if depth not in pattern._pyramid_levels:
+        pattern._pyramid_levels[depth] = pyrdown(pattern.get_image(), depth)
+    return pattern._pyramid_levels[depth]
+
+
+def pyramid_search(field, pattern):
+    """
+    The same contract as :func:`pikuli.matching.plain.plain_search`.
+    """
+    depth = pattern_pyramid_depth(pattern)
+    field_h, field_w = field.shape[:2]
+    if depth == 0 or (field_h >> depth) < (pattern.getH() >> depth) + 1 or (field_w >> depth) < (pattern.getW() >> depth) + 1:
+        return plain_search(field, pattern)
+
+    coarse_res = match_template(pyrdown(field, depth), _pattern_level(pattern, depth))
+    coarse_threshold = pattern.getSimilarity() - pikuli.Settings.PyramidScoreSlack * depth
+    candidates = (coarse_res > coarse_threshold).astype(np.uint8)
+
+    n_candidates = int(np.count_nonzero(candidates))
+    if n_candidates == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    if n_candidates > pikuli.Settings.PyramidMaxCandidatesRatio * candidates.size:
+        return plain_search(field, pattern)
+
+    # A coarse position (cx, cy) corresponds to full resolution positions around (cx, cy) * 2**depth.
+    # Dilation by one coarse pixel gives the margin of 2**depth full resolution pixels.
+    scale = 1 << depth
+    candidates = cv2.dilate(candidates, np.ones((3, 3), np.uint8))
+    res_h = field_h - pattern.getH() + 1
+    res_w = field_w - pattern.getW() + 1
+    mask = np.zeros((res_h, res_w), np.uint8)
+    fine = np.repeat(np.repeat(candidates, scale, axis=0), scale, axis=1)[:res_h, :res_w]
+    mask[:fine.shape[0], :fine.shape[1]] = fine
+    if fine.shape[0] < res_h:
+        mask[fine.shape[0]:, :] = mask[fine.shape[0] - 1:fine.shape[0], :]
+    if fine.shape[1] < res_w:
+        mask[:, fine.shape[1]:] = mask[:, fine.shape[1] - 1:fine.shape[1]]
+
+    # Score map is filled by the full resolution pass only inside the bounding boxes of
+    # candidate neighbourhoods; zero elsewhere never passes the similarity threshold.
+    res = np.zeros((res_h, res_w), np.float32)
+    n_labels, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    for x0, y0, w, h, _ in stats[1:n_labels]:
+        sub_field = field[y0:y0 + h + pattern.getH() - 1, x0:x0 + w + pattern.getW() - 1]
+        res[y0:y0 + h, x0:x0 + w] = match_template(sub_field, pattern.get_image())
+
+    return hits_above(res, field, pattern)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Parallel `cv2.matchTemplate` for very large fields (a multi-monitor `Screen(0)`): one call runs on a
+single core. The score map is split into horizontal stripes of `Settings.StripeRows` rows; the
+field stripe of each of them is a zero-copy view overlapping the next one by the pattern height
+minus 1, so every position sees its whole window. Stripes are matched on their own thread pool
+(`Settings.StripeThreads` workers) straight into the rows of one score map.
+
+OpenCV correlates by blocks in float32, so scores may differ from a single call in the last bits
+(about 1e-6); :func:`pikuli.matching.plain.hits_above` decides positions that close to the
+threshold exactly, so the hits do not depend on the split.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import pikuli
+
+
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+
+def stripe_workers():
+    workers = pikuli.Settings.StripeThreads
+    return os.cpu_count() or 1 if workers is None else workers
+
+
+def _get_executor(workers):
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pikuli-stripe')
+            _executor_workers = workers
+    return _executor
+
+
+def use_stripes(field, pattern_img):
+    """ Whether the field is large enough (`Settings.StripeMinPixels`) to be split. """
+    min_pixels = pikuli.Settings.StripeMinPixels
+    return (min_pixels is not None and field.shape[0] * field.shape[1] >= min_pixels and stripe_workers() > 1 and
+            field.shape[0] - pattern_img.shape[0] + 1 > pikuli.Settings.StripeRows)
+
+
+def striped_match_template(field, pattern_img, rows=None, workers=None):
+    """
+    The same as :func:`pikuli.matching.plain.match_template`, computed by stripes of `rows` score
+    map rows on `workers` threads (`None` -- `Settings.StripeRows`, :func:`stripe_workers`).
+    """
+    rows = int(rows or pikuli.Settings.StripeRows)
+    workers = workers or stripe_workers()
+    (ph, pw) = pattern_img.shape[:2]
+    (res_h, res_w) = (field.shape[0] - ph + 1, field.shape[1] - pw + 1)
+    if res_h <= rows or workers <= 1:
+        return cv2.matchTemplate(field, pattern_img, cv2.TM_CCORR_NORMED)
+
+    res = np.empty((res_h, res_w), np.float32)
+
+    def match_stripe(y0):
+        y1 = min(res_h, y0 + rows)
+        res[y0:y1] = cv2.matchTemplate(field[y0:y1 + ph - 1], pattern_img, cv2.TM_CCORR_NORMED)
+
+    # list() re-raises an exception of any stripe:
+    list(_get_executor(workers).map(match_stripe, range(0, res_h, rows)))
+    return res
+
+
+def stripes_search(field, pattern):
+    """ The same contract as :func:`pikuli.matching.plain.plain_search`; the field is always split. """
+    from .plain import hits_above  # Circular: plain uses this module.
+    return hits_above(striped_match_template(field, pattern.get_image()), field, pattern)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cheap change detection. A picture is split into square tiles and every tile gets a 32-bit hash:
+the sum of its bytes multiplied by fixed pseudo-random odd weights (modulo 2**32). Comparing the
+hashes of two pictures tells which tiles have changed without keeping the previous picture.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+import pikuli
+
+
+def _weights(rows, row_len):
+    """
+    Odd `uint32` weights of the bytes of a tile band. A weight depends on the byte position only
+    (mixed as in splitmix64), so the weights of a narrower picture are a slice of the wider ones.
+    """
+    with np.errstate(over='ignore'):
+        z = (np.arange(rows, dtype=np.uint64)[:, None] << np.uint64(32)) + np.arange(row_len, dtype=np.uint64)
+        z = (z + np.uint64(0x9e3779b97f4a7c15)) * np.uint64(0xbf58476d1ce4e5b9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        z ^= z >> np.uint64(31)
+    return (z >> np.uint64(32)).astype(np.uint32) | np.uint32(1)
+
+
+class TileHasher(object):
+
+    def __init__(self, tile=None):
+        """ :param tile: Tile side in pixels. `None` -- `Settings.ChangeTileSize`. """
+        self.tile = int(tile or pikuli.Settings.ChangeTileSize)
+        self._weights = None
+        self._buf = None
+
+    def _prepare(self, shape):
+        h, w = shape[:2]
+        channels = shape[2] if len(shape) > 2 else 1
+        ntx = -(-w // self.tile)
+        row_len = ntx * self.tile * channels
+        if self._weights is None or self._weights.shape[1] < row_len:
+            self._weights = _weights(self.tile, row_len)
+            self._buf = np.empty((self.tile, row_len), np.uint32)
+        return ntx, channels, row_len
+
+    def grid_shape(self, shape):
+        return -(-shape[0] // self.tile), -(-shape[1] // self.tile)
+
+    def hashes(self, img):
+        """ Returns the `uint32` array of tile hashes; its shape is :meth:`grid_shape`. """
+        ntx, channels, row_len = self._prepare(img.shape)
+        h, w = img.shape[:2]
+        nty = -(-h // self.tile)
+        flat = img.reshape(h, w * channels)
+        res = np.empty((nty, ntx), np.uint32)
+        buf, weights = self._buf[:, :row_len], self._weights[:, :row_len]
+        for ty in range(nty):
+            band = flat[ty * self.tile:(ty + 1) * self.tile]
+            buf[:] = 0
+            buf[:band.shape[0], :band.shape[1]] = band
+            np.multiply(buf, weights, out=buf)
+            res[ty] = buf.reshape(self.tile, ntx, self.tile * channels).sum(axis=(0, 2), dtype=np.uint32)
+        return res
+
+    def tile_rects(self, mask, shape):
+        """
+        Merges the marked tiles of the boolean grid `mask` into bounding rectangles of its
+        8-connected groups. Returns a list of `(x, y, w, h)` in pixels clipped by `shape`.
+        """
+        n, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+        rects = []
+        for tx, ty, tw, th, _ in stats[1:n]:
+            x, y = tx * self.tile, ty * self.tile
+            rects.append((x, y, min(tw * self.tile, shape[1] - x), min(th * self.tile, shape[0] - y)))
+        return rects
+
+
+class ChangeTracker(object):
+    """ Remembers the tile hashes of the previous picture and reports what has changed since. """
+
+    def __init__(self, tile=None):
+        self._hasher = TileHasher(tile)
+        self._hashes = None
+        self._shape = None
+
+    def update(self, img):
+        """
+        :return: `None` if everything should be treated as changed (the first picture or another
+                 size), otherwise the list of changed rectangles `(x, y, w, h)` (empty if nothing
+                 has changed).
+        """
+        hashes = self._hasher.hashes(img)
+        prev_hashes, prev_shape = self._hashes, self._shape
+        self._hashes, self._shape = hashes, img.shape
+        if prev_hashes is None or prev_shape != img.shape:
+            return None
+        return self._hasher.tile_rects(hashes != prev_hashes, img.shape)
+
+    def reset(self):
+        self._hashes = None
+        self._shape = None
+
+
+_thread_hashers = threading.local()
+
+
+def thread_hasher(tile):
+    """ :class:`TileHasher` of the current thread (hashers keep buffers, so they are not shared). """
+    if not hasattr(_thread_hashers, 'hashers'):
+        _thread_hashers.hashers = {}
+    if tile not in _thread_hashers.hashers:
+        _thread_hashers.hashers[tile] = TileHasher(tile)
+    return _thread_hashers.hashers[tile]
+
+
+class ImageDigest(object):
+    """
+    Compact stand-in of a stored picture: its shape, tile hashes and, optionally, a reduced copy.
+    Tells whether and where a new picture of the same area differs. Two different tiles may have
+    equal hashes, but with 32-bit hashes this is negligible.
+    """
+
+    __slots__ = ('shape', 'tile', 'hashes', 'thumbnail')
+
+    def __init__(self, img, tile=None, thumbnail_scale=None):
+        """
+        :param tile: Tile side in pixels. `None` -- `Settings.DigestTileSize`.
+        :param thumbnail_scale: Keep the picture reduced this number of times (`cv2.INTER_AREA`).
+                                `None` -- `Settings.DigestThumbnailScale`; `None` there -- no thumbnail.
+        """
+        self.tile = int(tile or pikuli.Settings.DigestTileSize)
+        self.shape = img.shape
+        self.hashes = thread_hasher(self.tile).hashes(img)
+        if thumbnail_scale is None:
+            thumbnail_scale = pikuli.Settings.DigestThumbnailScale
+        self.thumbnail = None
+        if thumbnail_scale:
+            size = (max(1, int(round(img.shape[1] / thumbnail_scale))), max(1, int(round(img.shape[0] / thumbnail_scale))))
+            self.thumbnail = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+    def changed_rects(self, img):
+        """
+        :return: `None` if `img` has another shape (everything has changed), otherwise the list
+                 of changed rectangles `(x, y, w, h)` (empty if nothing has changed).
+        """
+        if img.shape != self.shape:
+            return None
+        hasher = thread_hasher(self.tile)
+        return hasher.tile_rects(hasher.hashes(img) != self.hashes, img.shape)
+
+    def is_equal_to(self, img):
+        return img.shape == self.shape and np.array_equal(thread_hasher(self.tile).hashes(img), self.hashes)
+
+    @property
+    def nbytes(self):
+        return self.hashes.nbytes + (0 if self.thumbnail is None else self.thumbnail.nbytes)
+
+    def __repr__(self):
+        return '<ImageDigest of {} by {} px tiles{}>'.format(
+            self.shape, self.tile, '' if self.thumbnail is None else ', thumbnail {}'.format(self.thumbnail.shape))
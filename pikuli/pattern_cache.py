@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+Process-wide cache of decoded pattern images. :class:`pikuli.Pattern` takes its pixels from here
+instead of calling `cv2.imread` on every construction.
+
+An entry is keyed by the real path of the file together with its mtime and size, so a file
+rewritten on disk is decoded again. The total size of the cached arrays is bounded by
+`Settings.PatternCacheMaxBytes`; least recently used entries are evicted first. Cached arrays are
+shared between patterns and therefore read-only.
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import cv2
+
+import pikuli
+
+
+CacheStats = namedtuple('CacheStats', 'hits misses evictions entries nbytes')
+
+
+class PatternImageCache(object):
+
+    def __init__(self, max_bytes=None):
+        """
+        :param max_bytes: Memory cap in bytes. `None` -- use `Settings.PatternCacheMaxBytes` at
+                          the moment of each insertion.
+        """
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> numpy array
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _key(path):
+        real_path = os.path.realpath(path)
+        st = os.stat(real_path)
+        return (real_path, st.st_mtime_ns, st.st_size)
+
+    def get(self, path):
+        """
+        Returns the decoded BGR image of the file `path` (as `cv2.imread` does) or `None` if the
+        file can not be decoded.
+        """
+        key = self._key(path)
+        with self._lock:
+            img = self._entries.get(key)
+            if img is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return img
+            self._misses += 1
+
+        # Decoding is done without the lock. Two threads may decode the same file simultaneously;
+        # then the second result just replaces the first one.
+        img = cv2.imread(key[0])
+        if img is None:
+            return None
+        img.flags.writeable = False
+        self._put(key, img)
+        return img
+
+    def _put(self, key, img):
+        max_bytes = self._max_bytes if self._max_bytes is not None else pikuli.Settings.PatternCacheMaxBytes
+        if img.nbytes > max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+            # Stale versions of the same file (other mtime or size) are dropped right away:
+            for stale_key in [k for k in self._entries if k[0] == key[0]]:
+                self._nbytes -= self._entries.pop(stale_key).nbytes
+            self._entries[key] = img
+            self._nbytes += img.nbytes
+            while self._nbytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = self._misses = self._evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._nbytes)
+
+
+pattern_image_cache = PatternImageCache()
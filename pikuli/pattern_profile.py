@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per-pattern search parameters stored next to the image: `button.png.json` for `button.png`.
+:class:`pikuli.Pattern` reads the file lazily, when a parameter is needed for the first time;
+arguments given to the `Pattern` constructor take precedence over the file. Example::
+
+    {
+        "similarity": 0.99,
+        "method": "ccorr_normed",
+        "search_mode": "pyramid",
+        "channels": "color",
+        "pyramid_depth": 2,
+        "scale": 1.25,
+        "roi": [0, 0, 400, 120]
+    }
+
+    similarity     --  threshold, as the `similarity` argument of `Pattern`;
+    method         --  'ccorr_normed' (TM_CCORR_NORMED, the default) or 'sqdiff_normed' (TM_SQDIFF_NORMED,
+                       the 'plain' mode only);
+    search_mode    --  one of `pikuli.matching.SEARCH_MODES`;
+    channels       --  'color' or 'gray' (grayscale-first search, if the mode is 'plain' or not given);
+    pyramid_depth  --  depth bound for the 'pyramid' mode;
+    scale, scales  --  expected display scaling of the pattern, or several of them (see
+                       `Pattern.multiscale()`);
+    roi            --  `[x, y, w, h]` in screen coordinates where the pattern is usually found: `find()` and
+                       waits look there before the whole region.
+
+Other keys (e.g. "calibration" written by :mod:`pikuli.calibrate`) are kept but not used. The files
+are written by `python -m pikuli.calibrate`.
+"""
+
+import json
+import os
+
+from ._exceptions import FailExit
+
+
+PROFILE_SUFFIX = '.json'
+METHODS = ('ccorr_normed', 'sqdiff_normed')
+CHANNELS = ('color', 'gray')
+
+
+def profile_path(image_path):
+    return image_path + PROFILE_SUFFIX
+
+
+def _check(profile, path):
+    def fail(key, msg):
+        raise FailExit('bad value of \'{}\' in pattern profile {}: {!r} ({})'.format(key, path, profile[key], msg))
+
+    if 'similarity' in profile and not (isinstance(profile['similarity'], float) and 0.0 < profile['similarity'] <= 1.0):
+        fail('similarity', 'a float in (0, 1]')
+    if profile.get('method', METHODS[0]) not in METHODS:
+        fail('method', 'one of {}'.format(METHODS))
+    if profile.get('channels', CHANNELS[0]) not in CHANNELS:
+        fail('channels', 'one of {}'.format(CHANNELS))
+    if 'pyramid_depth' in profile and not (isinstance(profile['pyramid_depth'], int) and profile['pyramid_depth'] >= 0):
+        fail('pyramid_depth', 'a non-negative integer')
+    if 'scale' in profile and not (isinstance(profile['scale'], (int, float)) and profile['scale'] > 0):
+        fail('scale', 'a positive number')
+    if 'scales' in profile and not (isinstance(profile['scales'], list) and all(
+            isinstance(s, (int, float)) and s > 0 for s in profile['scales'])):
+        fail('scales', 'a list of positive numbers')
+    if 'roi' in profile and not (isinstance(profile['roi'], list) and len(profile['roi']) == 4 and all(
+            isinstance(v, int) for v in profile['roi']) and profile['roi'][2] > 0 and profile['roi'][3] > 0):
+        fail('roi', '[x, y, w, h] of integers')
+
+
+def load_profile(image_path):
+    """ Returns the profile of the image at `image_path` as a dict; `{}` if there is no profile file. """
+    path = profile_path(image_path)
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except ValueError as ex:
+        raise FailExit('pattern profile {} is not valid JSON: {}'.format(path, ex))
+    if not isinstance(profile, dict):
+        raise FailExit('pattern profile {} should contain a JSON object'.format(path))
+    _check(profile, path)
+    return profile
+
+
+def save_profile(image_path, profile):
+    path = profile_path(image_path)
+    _check(profile, path)
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=4, sort_keys=True)
+    return path
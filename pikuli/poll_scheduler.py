@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+"""
+Timing of repeated attempts (image waits and so on). The time limit is a deadline on the
+`time.monotonic()` scale, so the time spent on the attempts themselves is counted. Delays between
+attempts grow from `min_delay` to `max_delay` by the factor `backoff`: fast early retries notice
+quick changes, later ones do not burn CPU. A sleep ends early when the wake-up source reports a
+change.
+"""
+
+import time
+
+import pikuli
+
+
+class PollScheduler(object):
+
+    def __init__(self, timeout, min_delay=None, max_delay=None, backoff=None, wake_source=None):
+        """
+        :param timeout: Seconds; `None` -- no deadline.
+        :param min_delay: The first delay. `None` -- `Settings.PollMinDelay`.
+        :param max_delay: The upper bound of delays. `None` -- `Settings.PollMaxDelay`.
+        :param backoff: Every next delay is `backoff` times longer. `None` -- `Settings.PollBackoff`.
+        :param wake_source: Object with method `wait_for_change(since, timeout)` which returns as
+                            soon as something has changed after the moment `since`
+                            (e.g. :class:`pikuli.capture.CaptureService`).
+        """
+        self._start = time.monotonic()
+        self._deadline = None if timeout is None else self._start + timeout
+        self._delay = float(pikuli.Settings.PollMinDelay if min_delay is None else min_delay)
+        self._max_delay = float(pikuli.Settings.PollMaxDelay if max_delay is None else max_delay)
+        self._backoff = float(pikuli.Settings.PollBackoff if backoff is None else backoff)
+        self._wake_source = wake_source
+        self.attempts = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self._start
+
+    @property
+    def remaining(self):
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    def expired(self):
+        return self._deadline is not None and time.monotonic() >= self._deadline
+
+    def sleep(self, since=None):
+        """
+        Waits before the next attempt: the current delay, but not past the deadline. Returns
+        `False` if the deadline has been reached already (no more attempts are needed).
+
+        :param since: Moment (`time.monotonic()` scale) of the picture the last attempt has analyzed,
+                      e.g. the capture time of the frame. A change reported by the wake-up source after
+                      it ends the wait at once, even if it has happened while the attempt was running.
+                      `None` -- now.
+        """
+        self.attempts += 1
+        remaining = self.remaining
+        if remaining is not None and remaining <= 0:
+            return False
+        delay = self._delay if remaining is None else min(self._delay, remaining)
+        self._delay = min(self._max_delay, self._delay * self._backoff)
+
+        if self._wake_source is not None:
+            self._wake_source.wait_for_change(time.monotonic() if since is None else since, delay)
+        else:
+            time.sleep(delay)
+        return True
+
+    def __repr__(self):
+        return '<PollScheduler elapsed {:.3f} s, remaining {}, next delay {:.3f} s>'.format(
+            self.elapsed, self.remaining, self._delay)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+"""
+Watching of small screen areas (:class:`pikuli.Location` and :class:`pikuli.Region`) for
+changes. Only the watched areas are captured: pixels through :func:`pikuli.capture.probe_pixels`
+in one call, regions by their own rectangles into preallocated buffers. While a
+:class:`pikuli.capture.CaptureService` covering all the areas runs, they are cropped from its
+frames instead, and the watcher wakes up on every new frame.
+
+The watcher spends at most `cpu_budget` of a core: after each check it rests at least as long
+as the check took times `(1 - cpu_budget) / cpu_budget`.
+
+Usage::
+
+    watcher = Watcher([status_led, progress_region], tolerance=8)
+    changed = watcher.wait(timeout=5)   # The targets which have changed, or [] on timeout.
+
+    with Watcher([dialog_region], callback=on_change):
+        ...  # on_change(target, image) is called from the background thread.
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import pikuli
+from pikuli import FailExit, logger
+from pikuli._functions import _take_screenshot
+from pikuli.capture import CaptureService, FrameSources, probe_pixels
+
+
+class _Target(object):
+
+    __slots__ = ('obj', 'rect', 'source', 'callback', 'tolerance', 'image', 'buffer')
+
+    def __init__(self, obj, rect, source, callback, tolerance):
+        self.obj = obj
+        self.rect = rect
+        self.source = source
+        self.callback = callback
+        self.tolerance = tolerance
+        self.image = None   # The last seen picture (BGR, shape (h, w, 3)).
+        self.buffer = None  # Second buffer the next picture is grabbed into.
+
+
+class Watcher(object):
+
+    def __init__(self, targets=(), callback=None, tolerance=None, interval=None, cpu_budget=None, source=None):
+        """
+        :param targets: :class:`pikuli.Location` and :class:`pikuli.Region` objects to watch.
+        :param callback: Default callback of the targets: `callback(target, image)`, where `image`
+                         is the new BGR picture of the target.
+        :param tolerance: A pixel counts as changed if a channel differs by more than this value.
+                          `None` -- `Settings.WatcherTolerance`.
+        :param interval: The shortest period of checks, seconds. `None` -- `Settings.WatcherInterval`.
+        :param cpu_budget: The largest share of a core spent on checks. `None` -- `Settings.WatcherCpuBudget`.
+        :param source: Frame source for the Locations and for the Regions without their own one.
+        """
+        self._callback = callback
+        self._tolerance = int(pikuli.Settings.WatcherTolerance if tolerance is None else tolerance)
+        self._interval = float(pikuli.Settings.WatcherInterval if interval is None else interval)
+        self._cpu_budget = float(pikuli.Settings.WatcherCpuBudget if cpu_budget is None else cpu_budget)
+        if not 0 < self._cpu_budget <= 1:
+            raise FailExit('Watcher: cpu_budget should be in (0, 1], not {!r}'.format(self._cpu_budget))
+        self._source = source
+        self._targets = []
+        self._lock = threading.RLock()
+        self._last_check = None
+        self._last_cost = 0.0
+        self._frame_timestamp = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        for obj in targets:
+            self.add(obj)
+
+    def add(self, target, callback=None, tolerance=None):
+        """ Starts watching `target`; its current picture is the reference the changes are counted from. """
+        if isinstance(target, pikuli.Region):
+            t = _Target(target, tuple(int(v) for v in target.geometry), target.get_frame_source() or self._source,
+                        callback, tolerance)
+        elif isinstance(target, pikuli.Location):
+            t = _Target(target, (int(round(target.x)), int(round(target.y)), 1, 1), self._source,
+                        callback, tolerance)
+        else:
+            raise FailExit('Watcher: a Location or a Region is expected, not {!r}'.format(target))
+        with self._lock:
+            self._targets.append(t)
+            self._capture([t])
+            t.image, t.buffer = t.buffer, None
+        return target
+
+    def remove(self, target):
+        with self._lock:
+            self._targets = [t for t in self._targets if t.obj is not target]
+
+    def reset(self):
+        """ Takes the current pictures as the new references. """
+        with self._lock:
+            self._capture(self._targets)
+            for t in self._targets:
+                t.image, t.buffer = t.buffer, t.image
+
+    @property
+    def targets(self):
+        return [t.obj for t in self._targets]
+
+    def __service(self):
+        ''' CaptureService to crop the pictures from, if all the targets are inside its frames. '''
+        service = CaptureService.get_active()
+        if service is None:
+            return None
+        selection = FrameSources.get_selection()
+        if all(service.captures(selection if t.source is None else t.source) and service.contains(*t.rect)
+               for t in self._targets):
+            return service
+        return None
+
+    def _capture(self, targets, service=None):
+        ''' Writes the current pictures of `targets` into their `buffer`. '''
+        if service is not None:
+            frame = service.get_frame()
+            self._frame_timestamp = frame.timestamp
+            for t in targets:
+                x, y, w, h = t.rect
+                rx, ry = service.rect[:2]
+                crop = frame.image[y - ry:y - ry + h, x - rx:x - rx + w]
+                if t.buffer is None or t.buffer.shape != crop.shape:
+                    t.buffer = crop.copy()
+                else:
+                    np.copyto(t.buffer, crop)
+            return
+
+        # All the pixels of one source are read by one probe:
+        pixels = {}
+        for t in targets:
+            if t.rect[2:] == (1, 1):
+                pixels.setdefault(id(t.source), []).append(t)
+            else:
+                t.buffer = _take_screenshot(*t.rect, out=t.buffer, source=t.source)
+        for group in pixels.values():
+            colors = probe_pixels([t.rect[:2] for t in group], source=group[0].source, bgr=True)
+            for t, color in zip(group, colors):
+                t.buffer = color.reshape(1, 1, 3)
+
+    def _differs(self, t):
+        tolerance = self._tolerance if t.tolerance is None else t.tolerance
+        if t.buffer.shape != t.image.shape:
+            return True
+        if tolerance <= 0:
+            return not np.array_equal(t.buffer, t.image)
+        return int(cv2.absdiff(t.buffer, t.image).max()) > tolerance
+
+    def check(self):
+        """
+        Captures the targets once and compares them with their references. For every changed
+        target the callback is called and the reference is replaced by the new picture.
+        Returns the list of the changed targets.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._capture(self._targets, self.__service())
+            changed = []
+            for t in self._targets:
+                if self._differs(t):
+                    t.image, t.buffer = t.buffer, t.image
+                    changed.append(t)
+        self._last_cost = time.perf_counter() - started
+        self._last_check = time.monotonic()
+
+        for t in changed:
+            callback = t.callback or self._callback
+            if callback is not None:
+                try:
+                    callback(t.obj, t.image)
+                except Exception:
+                    logger.exception('pikuli.Watcher: callback of {!r} failed'.format(t.obj))
+        return [t.obj for t in changed]
+
+    def _rest(self, deadline):
+        '''
+        Pause before the next check: not shorter than the interval and than the CPU budget demands
+        (the check time is measured by the wall clock, which is never less than the CPU time).
+        Returns `False` if the deadline comes first.
+        '''
+        rest = max(self._interval - self._last_cost, self._last_cost * (1.0 - self._cpu_budget) / self._cpu_budget)
+        wake_at = self._last_check + rest
+        if deadline is not None and wake_at >= deadline:
+            self._stop_event.wait(max(0.0, deadline - time.monotonic()))
+            return False
+        self._stop_event.wait(max(0.0, wake_at - time.monotonic()))
+
+        service = self.__service()
+        if service is not None:
+            # A check makes sense only with a new frame:
+            timeout = pikuli.Settings.PollMaxDelay if deadline is None else max(0.0, deadline - time.monotonic())
+            if service.get_frame(newer_than=self._frame_timestamp, timeout=timeout) is None and deadline is not None:
+                return False
+        return not self._stop_event.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Checks the targets repeatedly until some of them change. Returns the list of the changed
+        targets, or an empty list if nothing has changed in `timeout` seconds (`None` -- no limit).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self.check()
+            if changed:
+                return changed
+            if not self._rest(deadline):
+                return []
+
+    def start(self):
+        """ Checks the targets in a background thread; changes are reported to the callbacks only. """
+        if self._thread is not None:
+            raise FailExit('{!r} is running already'.format(self))
+        self._stop_event.clear()
+        # The thread captures through the same source as the thread which has started it:
+        self._thread = threading.Thread(target=self._run, args=(FrameSources.get_selection(),),
+                                        name='pikuli-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, source):
+        FrameSources.set_source(source)
+        while not self._stop_event.is_set():
+            try:
+                self.check()
+            except Exception:
+                logger.exception('pikuli.Watcher: check failed')
+                self._last_check = time.monotonic()
+            self._rest(None)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __repr__(self):
+        return '<Watcher of {} targets, tolerance {}, cpu budget {:.0%}>'.format(
+            len(self._targets), self._tolerance, self._cpu_budget)
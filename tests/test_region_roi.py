@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from pikuli import Pattern, Region
+from pikuli.capture import FrameSources, SyntheticFrameSource
+
+
+@pytest.mark.parametrize('roi, region', [
+    ([380, 290, 300, 200], (0, 0, 390, 600)),  # Overlaps the region by 10 pixels only.
+    ([400, 300, 10, 10], (0, 0, 800, 600)),    # Smaller than the pattern.
+])
+def test_roi_smaller_than_pattern(tmp_path, roi, region):
+    img = np.random.RandomState(0).randint(0, 256, (20, 30, 3)).astype(np.uint8)
+    path = str(tmp_path / 'pattern.png')
+    cv2.imwrite(path, img)
+    with open(path + '.json', 'w') as f:
+        json.dump({'roi': roi}, f)
+
+    source = SyntheticFrameSource(800, 600)
+    source.paste(img, 100, 100)
+    with FrameSources.using(source):
+        m = Region(*region).find(Pattern(path), timeout=0)
+    assert (m.x, m.y, m.w, m.h) == (100, 100, 30, 20)